@@ -0,0 +1,45 @@
+"""Mood text entries and their daily rollups
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mood_text_entries",
+        sa.Column("id", sqlmodel.AutoString(length=36), nullable=False),
+        sa.Column("user_id", sqlmodel.AutoString(length=64), nullable=True),
+        sa.Column("mood_text", sqlmodel.AutoString(), nullable=False),
+        sa.Column("mood_label", sqlmodel.AutoString(length=16), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_mood_text_entries_user_created", "mood_text_entries", ["user_id", "created_at"])
+    op.create_table(
+        "mood_daily_rollups",
+        sa.Column("user_id", sqlmodel.AutoString(length=64), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("mood_label", sqlmodel.AutoString(length=16), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("confidence_sum", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "day", "mood_label"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("mood_daily_rollups")
+    op.drop_index("ix_mood_text_entries_user_created", table_name="mood_text_entries")
+    op.drop_table("mood_text_entries")
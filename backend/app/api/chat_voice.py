@@ -1,11 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from typing import Optional
+import asyncio
+import json
 import uuid
 import logging
 
-from app.services.transcribe_service import transcribe_audio
-from app.services.moderation_service import moderate_text
-from app.services.gemini_service import get_gemini_response
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import stage
+from app.core.rate_limit import TooManyRequests, client_ip, enforce_rate_limit
+from app.services.audio_service import SpeechSegmenter, encode_wav, normalize_samples
+from app.services.transcribe_service import transcribe_audio, transcribe_upload, AudioTooLargeError
+from app.services.chat_pipeline import MessageFlaggedError, moderated_reply
 from pydantic import BaseModel
 from app.models.models import VoiceChatResponse
 
@@ -17,36 +24,41 @@ router = APIRouter()
 
 
 @router.post("/chat/voice", response_model=VoiceChatResponse)
-async def chat_voice(file: UploadFile = File(...), user_id: Optional[str] = None):
+async def chat_voice(request: Request, file: UploadFile = File(...), user_id: Optional[str] = None):
     """
     Endpoint to handle voice messages from frontend:
     1. Transcribe audio
     2. Moderate text
-    3. Get AI response from MindMate
+    3. Get AI response from MindMate (can run alongside step 2, see chat_pipeline)
     """
     if not file:
         raise HTTPException(status_code=422, detail="No audio file uploaded.")
 
+    await enforce_rate_limit("voice", user_id, client_ip(request))
+
     try:
-        # Step 1: Transcribe
-        transcribed_text = (await transcribe_audio(file.file.read(), file.content_type)).get("text", "")
+        # Step 1: Transcribe (upload is streamed to Whisper chunk by chunk)
+        try:
+            with stage("voice", "transcribe"):
+                transcription = await transcribe_upload(file)
+        except AudioTooLargeError as exc:
+            raise HTTPException(status_code=413, detail=str(exc))
+        transcribed_text = transcription.get("text", "")
         if not transcribed_text.strip():
             raise HTTPException(status_code=422, detail="Transcription failed or empty.")
 
-        # Step 2: Moderate
-        label, score = await moderate_text(transcribed_text)
-        if label == "toxic":
+        # Step 2 + 3: Moderate and generate AI response (overlapped when speculative)
+        try:
+            ai_response = await moderated_reply(
+                transcribed_text, [{"sender": "user", "text": transcribed_text}], user_id, pipeline="voice"
+            )
+        except MessageFlaggedError:
             logger.warning(f"[ChatVoice] Rejected toxic message from user {user_id}")
             raise HTTPException(
                 status_code=400,
                 detail="Message flagged as toxic. Please rephrase."
             )
 
-        # Step 3: Generate AI response (wrap transcribed text as message list)
-        ai_response = await get_gemini_response(
-            [{"sender": "user", "text": transcribed_text}], user_id
-        )
-
         return VoiceChatResponse(
             chat_id=str(uuid.uuid4()),
             transcribed_text=transcribed_text,
@@ -58,3 +70,200 @@ async def chat_voice(file: UploadFile = File(...), user_id: Optional[str] = None
     except Exception as exc:
         logger.error(f"[ChatVoice] Error processing voice chat: {exc}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process voice message.")
+
+
+class SegmentTranscriptionError(Exception):
+    """A segment of the turn couldn't be transcribed, so the transcript would be missing words."""
+
+
+class _VoiceTurn:
+    """
+    Audio segments of one spoken turn, transcribed as soon as each one closes.
+    Every segment takes a "voice_segment" rate-limit token before it goes to
+    Whisper, so a client that never sends "stop" can't transcribe for free.
+    """
+
+    def __init__(self, websocket: WebSocket, send_lock: asyncio.Lock, sample_rate: int,
+                 user_id: Optional[str], ip: str):
+        self.websocket = websocket
+        self.send_lock = send_lock
+        self.sample_rate = sample_rate
+        self.user_id = user_id
+        self.ip = ip
+        self.segmenter = SpeechSegmenter(
+            sample_rate,
+            threshold_db=settings.AUDIO_SILENCE_THRESHOLD_DB,
+            silence_ms=settings.VOICE_WS_SEGMENT_SILENCE_MS,
+            max_seconds=settings.VOICE_WS_MAX_SEGMENT_SECONDS
+        )
+        self.tasks: list[asyncio.Task] = []
+        self.received_bytes = 0
+
+    async def send(self, message: dict):
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    async def add_audio(self, frame: bytes):
+        """Raises AudioTooLargeError past the size limit and TooManyRequests when out of segment tokens."""
+        self.received_bytes += len(frame)
+        if self.received_bytes > settings.MAX_AUDIO_UPLOAD_BYTES:
+            raise AudioTooLargeError(f"Audio exceeds {settings.MAX_AUDIO_UPLOAD_BYTES} bytes.")
+        samples = np.frombuffer(frame[: len(frame) - len(frame) % 2], dtype="<i2").astype(np.float32) / 32768.0
+        for segment in self.segmenter.feed(samples):
+            await self._start(segment)
+
+    async def _start(self, segment: np.ndarray):
+        await enforce_rate_limit("voice_segment", self.user_id, self.ip)
+        index = len(self.tasks)
+        self.tasks.append(asyncio.create_task(self._transcribe(index, segment)))
+
+    async def _transcribe(self, index: int, segment: np.ndarray) -> str:
+        target_rate = settings.AUDIO_TARGET_SAMPLE_RATE
+        samples = normalize_samples(segment, self.sample_rate, target_rate, settings.AUDIO_SILENCE_THRESHOLD_DB)
+        if samples is None:
+            return ""
+        wav = encode_wav(samples, target_rate)
+        result = await transcribe_audio(wav, "audio/wav")
+        if "error" in result:
+            # One retry; after that the whole turn fails rather than replying to a partial utterance
+            logger.warning(f"[ChatVoice] Segment {index} transcription failed, retrying: {result['error']}")
+            result = await transcribe_audio(wav, "audio/wav")
+            if "error" in result:
+                raise SegmentTranscriptionError(result["error"])
+        text = result.get("text", "").strip()
+        if text:
+            await self.send({"type": "partial", "segment": index, "text": text})
+        return text
+
+    async def finish(self) -> str:
+        """
+        End of speech: transcribe the tail and return the turn's full text in order.
+        Raises SegmentTranscriptionError if any segment failed.
+        """
+        for segment in self.segmenter.flush():
+            await self._start(segment)
+        texts = await asyncio.gather(*self.tasks)
+        return " ".join(t for t in texts if t)
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+
+
+@router.websocket("/ws/chat/voice")
+async def chat_voice_ws(
+    websocket: WebSocket,
+    user_id: Optional[str] = None,
+    sample_rate: int = Query(16000, ge=8000, le=48000)
+):
+    """
+    Live voice chat over WebSocket.
+    - Client sends binary frames of 16-bit little-endian mono PCM at `sample_rate`
+      (8000-48000 Hz; anything else is refused with close code 1008) while the
+      user speaks, then `{"type": "stop"}` when they stop.
+    - Server sends `partial` transcripts as each pause-delimited segment is
+      transcribed, then the full `transcript`, then the AI `response`.
+    - Moderation and generation start as soon as `stop` arrives (overlapped
+      when speculative generation is on). The socket stays open for further
+      turns, which share the conversation history.
+    - Rate limits apply on connect, per transcribed segment and per turn; a
+      client over a limit or over MAX_AUDIO_UPLOAD_BYTES in one turn gets an
+      error frame and the socket is closed.
+    """
+    await websocket.accept()
+    ip = client_ip(websocket)
+    try:
+        await enforce_rate_limit("voice", user_id, ip)
+    except TooManyRequests as exc:
+        await websocket.send_json({"type": "error", "detail": exc.detail, "retry_after": exc.retry_after})
+        await websocket.close(code=1008)
+        return
+
+    send_lock = asyncio.Lock()
+    history: list[dict] = []
+    turn = _VoiceTurn(websocket, send_lock, sample_rate, user_id, ip)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes"):
+                try:
+                    await turn.add_audio(message["bytes"])
+                except AudioTooLargeError as exc:
+                    await turn.send({"type": "error", "detail": str(exc)})
+                    await websocket.close(code=1009)
+                    return
+                except TooManyRequests as exc:
+                    await turn.send({"type": "error", "detail": exc.detail, "retry_after": exc.retry_after})
+                    await websocket.close(code=1008)
+                    return
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                control = {}
+            if control.get("type") != "stop":
+                continue
+
+            # End of speech: remaining transcription, then moderate and generate
+            finished, turn = turn, _VoiceTurn(websocket, send_lock, sample_rate, user_id, ip)
+            try:
+                await enforce_rate_limit("voice", user_id, ip)
+                # Only the tail after "stop" is on the user's critical path
+                with stage("voice_ws", "transcribe"):
+                    transcribed_text = await finished.finish()
+            except TooManyRequests as exc:
+                finished.cancel()
+                await finished.send({"type": "error", "detail": exc.detail, "retry_after": exc.retry_after})
+                continue
+            except SegmentTranscriptionError as exc:
+                finished.cancel()
+                logger.error(f"[ChatVoice] Dropping turn for user {user_id}, segment failed: {exc}")
+                await finished.send({
+                    "type": "error",
+                    "detail": "Part of your message couldn't be transcribed. Please say it again."
+                })
+                continue
+            if not transcribed_text.strip():
+                await finished.send({"type": "error", "detail": "Transcription failed or empty."})
+                continue
+            await finished.send({"type": "transcript", "text": transcribed_text})
+
+            try:
+                ai_response = await moderated_reply(
+                    transcribed_text, history + [{"sender": "user", "text": transcribed_text}], user_id,
+                    pipeline="voice_ws"
+                )
+            except MessageFlaggedError:
+                logger.warning(f"[ChatVoice] Rejected toxic message from user {user_id}")
+                await finished.send({"type": "error", "detail": "Message flagged as toxic. Please rephrase."})
+                continue
+            except TooManyRequests as exc:
+                await finished.send({"type": "error", "detail": exc.detail, "retry_after": exc.retry_after})
+                continue
+
+            history.append({"sender": "user", "text": transcribed_text})
+            history.append({"sender": "ai", "text": ai_response})
+
+            await finished.send({
+                "type": "response",
+                "chat_id": str(uuid.uuid4()),
+                "transcribed_text": transcribed_text,
+                "ai_response": ai_response
+            })
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as exc:
+        logger.error(f"[ChatVoice] WebSocket error: {exc}", exc_info=True)
+        try:
+            await websocket.send_json({"type": "error", "detail": "Failed to process voice message."})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        turn.cancel()
@@ -1,19 +1,40 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import json
 import uuid
 import logging
 
-from app.services.moderation_service import moderate_text
-from app.services.gemini_service import get_gemini_response
+from app.core.rate_limit import client_ip, enforce_rate_limit
+from app.services.chat_pipeline import MessageFlaggedError, moderated_reply, moderated_stream
 from app.models.models import ChatRequest, ChatResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _latest_user_message(messages: list):
+    """Validate the conversation and return the latest user message."""
+    if not messages or not isinstance(messages, list) or len(messages) == 0:
+        raise HTTPException(status_code=422, detail="Messages cannot be empty.")
+
+    latest_user_msg = next((m for m in reversed(messages) if m.sender == "user"), None)
+    if not latest_user_msg or not latest_user_msg.text.strip():
+        raise HTTPException(status_code=422, detail="Latest user message cannot be empty.")
+    return latest_user_msg
+
+
+def _flagged(user_id: Optional[str]) -> HTTPException:
+    logger.warning(f"[Chat] Rejected toxic message from user {user_id}")
+    return HTTPException(
+        status_code=400,
+        detail="Message flagged as toxic. Please rephrase."
+    )
+
+
 @router.post("/chat", response_model=ChatResponse, status_code=200)
-async def chat_support(payload: ChatRequest):
+async def chat_support(payload: ChatRequest, request: Request):
     """
     Chat endpoint for MindMate.
     - Accepts last 5 messages for context
@@ -23,25 +44,16 @@ async def chat_support(payload: ChatRequest):
     messages = payload.messages
     user_id = payload.user_id
 
-    if not messages or not isinstance(messages, list) or len(messages) == 0:
-        raise HTTPException(status_code=422, detail="Messages cannot be empty.")
-
-    latest_user_msg = next((m for m in reversed(messages) if m.sender == "user"), None)
-    if not latest_user_msg or not latest_user_msg.text.strip():
-        raise HTTPException(status_code=422, detail="Latest user message cannot be empty.")
-
-    # Optional moderation: reject toxic messages
-    label, score = await moderate_text(latest_user_msg.text)
-    if label == "toxic":
-        logger.warning(f"[Chat] Rejected toxic message from user {user_id}")
-        raise HTTPException(
-            status_code=400,
-            detail="Message flagged as toxic. Please rephrase."
-        )
+    latest_user_msg = _latest_user_message(messages)
+    await enforce_rate_limit("chat", user_id, client_ip(request))
 
-    # Generate AI response
+    # Moderate latest user message and generate AI response (overlapped when speculative)
     try:
-        response_text = await get_gemini_response(messages, user_id)
+        response_text = await moderated_reply(latest_user_msg.text, messages, user_id)
+    except MessageFlaggedError:
+        raise _flagged(user_id)
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.error(f"[Chat] AI generation error for user {user_id}: {exc}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to generate AI response.")
@@ -50,3 +62,40 @@ async def chat_support(payload: ChatRequest):
         chat_id=str(uuid.uuid4()),
         response=response_text,
     )
+
+
+@router.post("/chat/stream", status_code=200)
+async def chat_support_stream(payload: ChatRequest, request: Request):
+    """
+    Streaming variant of /chat (Server-Sent Events).
+    - Same validation and moderation as /chat, before anything is streamed
+    - Sends `data: {"chunk": ...}` events as Gemini produces text
+    - Ends with `event: done` carrying the chat_id
+    """
+    messages = payload.messages
+    user_id = payload.user_id
+
+    latest_user_msg = _latest_user_message(messages)
+    await enforce_rate_limit("chat", user_id, client_ip(request))
+    try:
+        chunks = await moderated_stream(latest_user_msg.text, messages, user_id, pipeline="chat_stream")
+    except MessageFlaggedError:
+        raise _flagged(user_id)
+
+    chat_id = str(uuid.uuid4())
+
+    async def event_stream():
+        try:
+            async for chunk in chunks:
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+        except Exception as exc:
+            logger.error(f"[Chat] AI streaming error for user {user_id}: {exc}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to generate AI response.'})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'chat_id': chat_id})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
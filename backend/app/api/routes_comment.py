@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.rate_limit import client_ip, enforce_rate_limit
 from app.models.models import CommentRequest
 from app.services.moderation_service import moderate_text
+from app.services.moderation_jobs import moderation_queue
 import uuid
 
 router = APIRouter()
 
 @router.post("/comment", response_model=dict)
-async def submit_comment(payload: CommentRequest):
+async def submit_comment(payload: CommentRequest, request: Request):
     content = payload.content
     user_id = payload.user_id
     post_id = payload.post_id
@@ -18,6 +22,22 @@ async def submit_comment(payload: CommentRequest):
             detail={"error": "Comment cannot be empty."}
         )
 
+    await enforce_rate_limit("comment", user_id, client_ip(request))
+
+    # Async mode: queue the moderation and return the ID right away
+    if settings.MODERATION_ASYNC:
+        comment_id = await moderation_queue.submit(
+            {"kind": "comment", "content": content, "user_id": user_id, "post_id": post_id}
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "status": "pending",
+                "comment_id": comment_id,
+                "status_url": f"/moderation/jobs/{comment_id}"
+            }
+        )
+
     # Run moderation
     label, score = await moderate_text(content)
 
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.rate_limit import client_ip, enforce_rate_limit
+from app.models.schemas import ModerateBatchItem, ModerateBatchRequest, ModerateRequest, ModerateResponse
+from app.services.moderation_service import moderate_batch, moderate_text_detailed
+from app.services.text_features import normalize_text
+from app.services.moderation_jobs import job_status, moderation_queue
+
+router = APIRouter()
+
+
+def _status(verdict: dict) -> str:
+    if "error" in verdict:
+        return "error"
+    return "rejected" if verdict["label"] == "toxic" else "accepted"
+
+
+@router.post("/moderate", response_model=ModerateResponse)
+async def moderate(payload: ModerateRequest, request: Request):
+    if not payload.text or not payload.text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"error": "Content cannot be empty."}
+        )
+
+    await enforce_rate_limit("moderate", None, client_ip(request))
+    verdict = await moderate_text_detailed(payload.text)
+    return ModerateResponse(status=_status(verdict), label=verdict["label"], score=verdict["score"], source=verdict["source"])
+
+
+@router.post("/moderate/batch")
+async def moderate_batch_stream(payload: ModerateBatchRequest, request: Request):
+    """
+    Moderate many texts and stream one JSON object per line (NDJSON) in input
+    order. Duplicate texts (after normalization) are moderated once.
+    Each unique text costs one "moderate_batch" rate-limit token.
+    """
+    if len(payload.texts) > settings.MODERATION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={"error": f"At most {settings.MODERATION_BATCH_MAX_ITEMS} texts per batch."}
+        )
+
+    unique_texts = len({normalize_text(text) for text in payload.texts} - {""})
+    await enforce_rate_limit("moderate_batch", None, client_ip(request), cost=max(1, unique_texts))
+
+    async def lines():
+        async for index, verdict in moderate_batch(payload.texts, payload.concurrency):
+            item = ModerateBatchItem(
+                index=index,
+                status=_status(verdict),
+                label=verdict.get("label"),
+                score=verdict.get("score"),
+                source=verdict.get("source"),
+                error=verdict.get("error")
+            )
+            yield item.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/moderation/jobs/{job_id}", response_model=dict)
+async def moderation_job_status(job_id: str):
+    """State of a queued post/comment moderation: queued, processing, done or failed."""
+    if not moderation_queue.running:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Async moderation is not enabled."}
+        )
+    job = await moderation_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Job not found or expired."}
+        )
+    return job_status(job)
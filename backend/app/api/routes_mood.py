@@ -1,14 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from app.services.moderation_service import ensemble_mood
+from app.services.mood_analytics import get_user_stats
+from app.services.mood_service import PERIOD_DAYS, get_mood_history, list_mood_entries, store_mood_entry
+from app.core.rate_limit import client_ip, enforce_rate_limit
 from app.models.models import MoodEntryRequest
-import uuid
-from datetime import datetime, timedelta
 
 router = APIRouter()
 
 
 @router.post("/mood", response_model=dict)
-async def submit_mood(payload: MoodEntryRequest):
+async def submit_mood(payload: MoodEntryRequest, request: Request):
     mood_text = payload.mood_text
     user_id = payload.user_id
 
@@ -19,19 +21,31 @@ async def submit_mood(payload: MoodEntryRequest):
             detail={"error": "Mood text cannot be empty."}
         )
 
+    await enforce_rate_limit("mood", user_id, client_ip(request))
+
     # Run sentiment analysis
     try:
         label, confidence = await ensemble_mood(mood_text)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={"error": f"Sentiment analysis failed: {str(e)}"}
         )
 
-    fake_entry_id = str(uuid.uuid4())
+    # Persist (queued write-behind when enabled, so no commit wait here)
+    try:
+        entry = await store_mood_entry(user_id, mood_text, label, confidence)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": f"Failed to store mood entry: {str(e)}"}
+        )
+
     return {
         "status": "success",
-        "entry_id": fake_entry_id,
+        "entry_id": entry.id,
         "label": label,
         "confidence": confidence,
         "reason": "Mood detected successfully"
@@ -39,25 +53,50 @@ async def submit_mood(payload: MoodEntryRequest):
 
 
 @router.get("/mood/history", response_model=list)
-async def mood_history(period: str = "week"):
-    now = datetime.now()
-
-    # Simulate filtering by period
-    if period == "day":
-        days = 1
-    elif period == "month":
-        days = 30
-    else:  # default = week
-        days = 7
-
-    fake_entries = [
-        {
-            "id": str(uuid.uuid4()),
-            "mood_text": "happy" if i % 2 == 0 else "sad",
-            "mood_label": "positive" if i % 2 == 0 else "negative",
-            "confidence": 0.85 if i % 2 == 0 else 0.78,
-            "created_at": (now - timedelta(days=i)).isoformat()
-        } for i in range(days)
-    ]
-
-    return fake_entries
+async def mood_history(user_id: str = Query(..., min_length=1), period: str = "week"):
+    """Daily mood rollups (count and average confidence per label) for the dashboard."""
+    if period not in PERIOD_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"error": f"period must be one of {', '.join(PERIOD_DAYS)}."}
+        )
+    return await get_mood_history(user_id, period)
+
+
+@router.get("/mood/stats", response_model=dict)
+async def mood_stats(
+    user_id: str = Query(..., min_length=1),
+    days: int = Query(30, ge=1, le=366),
+    window: int = Query(7, ge=1, le=90)
+):
+    """Trend, streak, distribution and volatility stats over the last `days` days."""
+    return await get_user_stats(user_id, days, window)
+
+
+@router.get("/mood/entries", response_model=dict)
+async def mood_entries(
+    user_id: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Raw mood entries, newest first. Pass next_cursor back to get the next page."""
+    try:
+        entries, next_cursor = await list_mood_entries(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": str(e)}
+        )
+
+    return {
+        "entries": [
+            {
+                "id": entry.id,
+                "mood_text": entry.mood_text,
+                "mood_label": entry.mood_label,
+                "confidence": entry.confidence,
+                "created_at": entry.created_at.isoformat()
+            } for entry in entries
+        ],
+        "next_cursor": next_cursor
+    }
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.rate_limit import client_ip, enforce_rate_limit
 from app.models.models import PeerPostRequest
 from app.services.moderation_service import moderate_text
+from app.services.moderation_jobs import moderation_queue
 import uuid
 
 router = APIRouter()
 
 
 @router.post("/peer", response_model=dict)
-async def submit_peer_post(payload: PeerPostRequest):
+async def submit_peer_post(payload: PeerPostRequest, request: Request):
     content = payload.content
     user_id = payload.user_id
 
@@ -18,6 +22,22 @@ async def submit_peer_post(payload: PeerPostRequest):
             detail={"error": "Content cannot be empty."}
         )
 
+    await enforce_rate_limit("peer", user_id, client_ip(request))
+
+    # Async mode: queue the moderation and return the ID right away
+    if settings.MODERATION_ASYNC:
+        post_id = await moderation_queue.submit(
+            {"kind": "post", "content": content, "user_id": user_id}
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "status": "pending",
+                "post_id": post_id,
+                "status_url": f"/moderation/jobs/{post_id}"
+            }
+        )
+
     # Run moderation
     label, score = await moderate_text(content)
 
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.transcribe_service import transcribe_audio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from app.core.rate_limit import client_ip, enforce_rate_limit
+from app.services.transcribe_service import transcribe_upload, AudioTooLargeError
 
 router = APIRouter()
 
@@ -15,7 +16,7 @@ ALLOWED_MIME_TYPES = {
 
 
 @router.post("/transcribe", response_model=dict, status_code=200)
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(request: Request, file: UploadFile = File(...)):
     """
     Transcribe an uploaded audio file using Hugging Face Whisper model.
     """
@@ -27,8 +28,13 @@ async def transcribe(file: UploadFile = File(...)):
                    f"Allowed: {', '.join(ALLOWED_MIME_TYPES)}"
         )
 
-    file_bytes = await file.read()
-    result = await transcribe_audio(file_bytes)
+    await enforce_rate_limit("voice", None, client_ip(request))
+
+    # Stream the upload straight into the Whisper request body
+    try:
+        result = await transcribe_upload(file)
+    except AudioTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
 
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis tier is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class VerdictCache:
+    """
+    Two-tier cache for ensemble verdicts (label, score), keyed by a hash of the
+    normalized text and the model set that produced it.
+    - L1: in-process LRU with TTL, bounded by max_size
+    - L2: optional Redis, shared across workers
+    """
+
+    def __init__(self, max_size: int, ttl: float, redis_url: str = "", namespace: str = "mindmate:verdict"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self.namespace = namespace
+        self._local: "OrderedDict[str, tuple[float, tuple[str, float]]]" = OrderedDict()
+        self._redis = None
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(analyzer: str, models: Sequence[str], normalized_text: str) -> str:
+        raw = "\x1f".join([analyzer, ",".join(models), normalized_text])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_redis(self):
+        if not self.redis_url or aioredis is None:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def _get_local(self, key: str) -> Optional[tuple[str, float]]:
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: tuple[str, float]) -> None:
+        self._local[key] = (time.monotonic() + self.ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[tuple[str, float]]:
+        value = self._get_local(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(f"{self.namespace}:{key}")
+            except Exception as exc:
+                logger.warning(f"[VerdictCache] Redis get failed: {exc}")
+                raw = None
+            if raw:
+                label, score = json.loads(raw)
+                value = (label, float(score))
+                self._set_local(key, value)
+                self.redis_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: tuple[str, float]) -> None:
+        self._set_local(key, value)
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                await redis.set(f"{self.namespace}:{key}", json.dumps(list(value)), ex=int(self.ttl))
+            except Exception as exc:
+                logger.warning(f"[VerdictCache] Redis set failed: {exc}")
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._local),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self._get_redis() is not None,
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+verdict_cache = VerdictCache(
+    max_size=settings.VERDICT_CACHE_MAX_SIZE,
+    ttl=settings.VERDICT_CACHE_TTL,
+    redis_url=settings.REDIS_URL if settings.VERDICT_CACHE_REDIS else "",
+)
@@ -0,0 +1,154 @@
+import time
+from collections import deque
+from typing import Optional
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Health of one upstream model: rolling error rate, latency EWMA and a
+    closed -> open -> half_open breaker.
+    - closed: calls flow; opens when the recent error rate crosses the threshold
+    - open: calls are skipped until the cooldown has passed
+    - half_open: one probe call at a time; success closes, failure re-opens
+    """
+
+    def __init__(self, name: str, window: int, min_calls: int, error_threshold: float,
+                 cooldown: float, ewma_alpha: float = 0.2):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.ewma_alpha = ewma_alpha
+        self.state = CLOSED
+        self.latency_ewma: Optional[float] = None
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self._outcomes: deque = deque(maxlen=window)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def available(self) -> bool:
+        """Whether a call could go out now, without claiming the half_open probe slot."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            return now - self.opened_at >= self.cooldown
+        if self.state == HALF_OPEN:
+            return self.probe_started is None or now - self.probe_started >= self.cooldown
+        return True
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go out now. In half_open this claims the probe slot,
+        so only call it as the call actually starts.
+        """
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self.probe_started = None
+        if self.state == HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) frees the slot after a cooldown
+            if self.probe_started is not None and now - self.probe_started < self.cooldown:
+                return False
+            self.probe_started = now
+        return True
+
+    def _observe_latency(self, latency: Optional[float]) -> None:
+        if latency is None:
+            return
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.latency_ewma
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        self._observe_latency(latency)
+        self._outcomes.append(True)
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.probe_started = None
+            self._outcomes.clear()
+
+    def record_failure(self, latency: Optional[float] = None) -> None:
+        self._observe_latency(latency)
+        self._outcomes.append(False)
+        if self.state == HALF_OPEN:
+            self._open()
+        elif (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+              and self.error_rate >= self.error_threshold):
+            self._open()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate, 3),
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "calls": len(self._outcomes),
+        }
+
+
+class HealthScoreboard:
+    """Shared registry of per-upstream circuit breakers."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                window=settings.BREAKER_WINDOW,
+                min_calls=settings.BREAKER_MIN_CALLS,
+                error_threshold=settings.BREAKER_ERROR_THRESHOLD,
+                cooldown=settings.BREAKER_COOLDOWN_SECONDS,
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+    def available(self, name: str) -> bool:
+        if not settings.BREAKER_ENABLED:
+            return True
+        return self.get(name).available()
+
+    def allow(self, name: str) -> bool:
+        if not settings.BREAKER_ENABLED:
+            return True
+        return self.get(name).allow()
+
+    def healthy(self, names: list) -> list:
+        """
+        Filter a model list down to those whose circuit would let a call
+        through; ensembles skip the rest and average the vote over these.
+        Probe slots aren't claimed here; the call claims its own.
+        """
+        return [name for name in names if self.available(name)]
+
+    def record(self, name: str, ok: bool, latency: Optional[float] = None) -> None:
+        breaker = self.get(name)
+        if ok:
+            breaker.record_success(latency)
+        else:
+            breaker.record_failure(latency)
+
+    def snapshot(self) -> dict:
+        return {name: b.snapshot() for name, b in self._breakers.items()}
+
+
+scoreboard = HealthScoreboard()
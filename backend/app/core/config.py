@@ -6,4 +6,134 @@ load_dotenv()
 class Settings:
     HF_API_KEY: str = os.getenv("HF_API_KEY", "")
 
+    # Shared upstream HTTP client (connection pool)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30.0))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+    # Redis (optional, shared state across workers)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+
+    # Verdict cache for moderation / mood ensembles
+    VERDICT_CACHE_ENABLED: bool = os.getenv("VERDICT_CACHE_ENABLED", "true").lower() == "true"
+    VERDICT_CACHE_TTL: float = float(os.getenv("VERDICT_CACHE_TTL", 3600))
+    VERDICT_CACHE_MAX_SIZE: int = int(os.getenv("VERDICT_CACHE_MAX_SIZE", 10000))
+    VERDICT_CACHE_REDIS: bool = os.getenv("VERDICT_CACHE_REDIS", "true").lower() == "true"
+
+    # Toxicity ensemble: return once the weighted outcome is settled
+    MODERATION_QUORUM: bool = os.getenv("MODERATION_QUORUM", "true").lower() == "true"
+    MODERATION_BUDGET_SECONDS: float = float(os.getenv("MODERATION_BUDGET_SECONDS", 10.0))
+
+    # Local lexicon prefilter in front of the remote toxicity ensemble
+    LEXICON_PREFILTER_ENABLED: bool = os.getenv("LEXICON_PREFILTER_ENABLED", "true").lower() == "true"
+    LEXICON_PATH: str = os.getenv("LEXICON_PATH", "")
+    LEXICON_BENIGN_MAX_TOKENS: int = int(os.getenv("LEXICON_BENIGN_MAX_TOKENS", 6))
+
+    # Micro-batching of concurrent HF inference calls per model
+    HF_BATCHING_ENABLED: bool = os.getenv("HF_BATCHING_ENABLED", "true").lower() == "true"
+    HF_BATCH_MAX_SIZE: int = int(os.getenv("HF_BATCH_MAX_SIZE", 16))
+    HF_BATCH_MAX_WAIT_MS: float = float(os.getenv("HF_BATCH_MAX_WAIT_MS", 5))
+
+    # LLM provider chain (Gemini -> HF models): hedging and global deadline
+    LLM_HEDGING_ENABLED: bool = os.getenv("LLM_HEDGING_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+    LLM_HEDGE_DEFAULT_DELAY: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 4.0))
+    LLM_DEADLINE_SECONDS: float = float(os.getenv("LLM_DEADLINE_SECONDS", 20.0))
+
+    # Per-upstream circuit breakers
+    BREAKER_ENABLED: bool = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+    BREAKER_WINDOW: int = int(os.getenv("BREAKER_WINDOW", 20))
+    BREAKER_MIN_CALLS: int = int(os.getenv("BREAKER_MIN_CALLS", 5))
+    BREAKER_ERROR_THRESHOLD: float = float(os.getenv("BREAKER_ERROR_THRESHOLD", 0.5))
+    BREAKER_COOLDOWN_SECONDS: float = float(os.getenv("BREAKER_COOLDOWN_SECONDS", 30.0))
+
+    # Gemini prompt: history token budget
+    GEMINI_HISTORY_TOKEN_BUDGET: int = int(os.getenv("GEMINI_HISTORY_TOKEN_BUDGET", 1500))
+    GEMINI_MAX_MESSAGE_TOKENS: int = int(os.getenv("GEMINI_MAX_MESSAGE_TOKENS", 500))
+
+    # Audio uploads streamed to Whisper
+    MAX_AUDIO_UPLOAD_BYTES: int = int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", 25 * 1024 * 1024))
+    AUDIO_STREAM_CHUNK_BYTES: int = int(os.getenv("AUDIO_STREAM_CHUNK_BYTES", 64 * 1024))
+
+    # Chunked parallel transcription for long voice notes
+    TRANSCRIBE_CHUNKING_ENABLED: bool = os.getenv("TRANSCRIBE_CHUNKING_ENABLED", "false").lower() == "true"
+    TRANSCRIBE_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", 20.0))
+    TRANSCRIBE_CHUNK_OVERLAP_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_OVERLAP_SECONDS", 1.0))
+    TRANSCRIBE_SILENCE_SEARCH_SECONDS: float = float(os.getenv("TRANSCRIBE_SILENCE_SEARCH_SECONDS", 3.0))
+    TRANSCRIBE_MAX_PARALLEL: int = int(os.getenv("TRANSCRIBE_MAX_PARALLEL", 4))
+
+    # WAV normalization before Whisper (mono, resample, trim silence)
+    AUDIO_NORMALIZE_ENABLED: bool = os.getenv("AUDIO_NORMALIZE_ENABLED", "true").lower() == "true"
+    AUDIO_TARGET_SAMPLE_RATE: int = int(os.getenv("AUDIO_TARGET_SAMPLE_RATE", 16000))
+    AUDIO_SILENCE_THRESHOLD_DB: float = float(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", -45.0))
+
+    # WebSocket voice chat: pause length that closes a segment, and max segment length
+    VOICE_WS_SEGMENT_SILENCE_MS: int = int(os.getenv("VOICE_WS_SEGMENT_SILENCE_MS", 600))
+    VOICE_WS_MAX_SEGMENT_SECONDS: float = float(os.getenv("VOICE_WS_MAX_SEGMENT_SECONDS", 15.0))
+
+    # Start AI generation alongside moderation; the reply is dropped if the message is flagged
+    CHAT_SPECULATIVE_GENERATION: bool = os.getenv("CHAT_SPECULATIVE_GENERATION", "true").lower() == "true"
+
+    # Database (async SQLAlchemy / SQLModel); SQLite works locally
+    DATABASE_URL: str = os.getenv("DATABASE_URL") or "sqlite+aiosqlite:///./mindmate.db"
+    DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", "false").lower() == "true"
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", 10))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", 20))
+    # Apply Alembic migrations on startup; turn off when `alembic upgrade head` runs as a release step
+    DATABASE_MIGRATE_ON_STARTUP: bool = os.getenv("DATABASE_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+    # Write-behind batching for mood inserts. Off by default: POST /mood then answers before the row
+    # is committed, so entries still queued are lost if the process dies
+    MOOD_WRITE_BEHIND: bool = os.getenv("MOOD_WRITE_BEHIND", "false").lower() == "true"
+    MOOD_WRITE_BATCH_SIZE: int = int(os.getenv("MOOD_WRITE_BATCH_SIZE", 100))
+    MOOD_WRITE_FLUSH_MS: float = float(os.getenv("MOOD_WRITE_FLUSH_MS", 200))
+
+    # IANA timezone whose calendar days the mood rollups, history and stats use
+    MOOD_TIMEZONE: str = os.getenv("MOOD_TIMEZONE", "Asia/Dhaka")
+
+    # Bulk moderation (/moderate/batch): concurrent ensemble runs and max texts per request
+    MODERATION_BATCH_CONCURRENCY: int = int(os.getenv("MODERATION_BATCH_CONCURRENCY", 16))
+    MODERATION_BATCH_MAX_ITEMS: int = int(os.getenv("MODERATION_BATCH_MAX_ITEMS", 100))
+
+    # Async moderation for /peer and /comment: 202 now, result via /moderation/jobs/{id}
+    MODERATION_ASYNC: bool = os.getenv("MODERATION_ASYNC", "false").lower() == "true"
+    MODERATION_QUEUE_WORKERS: int = int(os.getenv("MODERATION_QUEUE_WORKERS", 8))
+    MODERATION_QUEUE_VISIBILITY_TIMEOUT: float = float(os.getenv("MODERATION_QUEUE_VISIBILITY_TIMEOUT", 60.0))
+    MODERATION_QUEUE_MAX_ATTEMPTS: int = int(os.getenv("MODERATION_QUEUE_MAX_ATTEMPTS", 3))
+    MODERATION_QUEUE_RESULT_TTL: float = float(os.getenv("MODERATION_QUEUE_RESULT_TTL", 86400))
+
+    # Per-user token buckets per route ("route=count/seconds"); the client IP gets the multiplier
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS: str = os.getenv(
+        "RATE_LIMITS",
+        "chat=20/60,voice=10/60,voice_segment=60/60,peer=10/60,comment=30/60,mood=30/60,"
+        "moderate=10/60,moderate_batch=100/60"
+    )
+    RATE_LIMIT_IP_MULTIPLIER: float = float(os.getenv("RATE_LIMIT_IP_MULTIPLIER", 5))
+    # Proxies in front of the API that append to X-Forwarded-For. 0 uses the socket peer and ignores
+    # the header, which clients can forge; set 1 behind Render or another single reverse proxy
+    TRUSTED_PROXY_COUNT: int = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+
+    # Service-wide concurrent calls per upstream; excess waits up to the queue timeout, then 429
+    UPSTREAM_GOVERNOR_ENABLED: bool = os.getenv("UPSTREAM_GOVERNOR_ENABLED", "true").lower() == "true"
+    UPSTREAM_CONCURRENCY: str = os.getenv("UPSTREAM_CONCURRENCY", "gemini=16,hf=32,whisper=8")
+    UPSTREAM_QUEUE_TIMEOUT: float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", 5.0))
+    UPSTREAM_MAX_QUEUE: int = int(os.getenv("UPSTREAM_MAX_QUEUE", 64))
+    UPSTREAM_LEASE_TTL: float = float(os.getenv("UPSTREAM_LEASE_TTL", 120.0))
+
+    # Prometheus metrics at /metrics (request, upstream and pipeline stage latencies)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Upstream base URLs (Whisper is served from HF_INFERENCE_URL too); point at bench/stubs.py for offline load tests
+    HF_INFERENCE_URL: str = os.getenv("HF_INFERENCE_URL", "https://api-inference.huggingface.co/models").rstrip("/")
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+
+    # HF cold starts: how long a call may wait_for_model, and pinging idle models to keep them loaded
+    HF_WAIT_FOR_MODEL_BUDGET: float = float(os.getenv("HF_WAIT_FOR_MODEL_BUDGET", 10.0))
+    HF_WARMUP_ENABLED: bool = os.getenv("HF_WARMUP_ENABLED", "true").lower() == "true"
+    HF_WARMUP_INTERVAL: float = float(os.getenv("HF_WARMUP_INTERVAL", 240.0))
+    HF_WARMUP_TIMEOUT: float = float(os.getenv("HF_WARMUP_TIMEOUT", 60.0))
+    HF_WARMUP_CONCURRENCY: int = int(os.getenv("HF_WARMUP_CONCURRENCY", 4))
+
 settings = Settings()
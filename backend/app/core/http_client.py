@@ -0,0 +1,65 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build a pooled AsyncClient shared by all upstream calls (Hugging Face, Gemini).
+    Per-call timeouts are still passed by each service.
+    """
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logger.warning("[HttpClient] HTTP2_ENABLED is set but 'h2' is not installed, using HTTP/1.1.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2, timeout=30.0)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared client. Called from the app lifespan on startup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+        logger.info("[HttpClient] Shared upstream client started.")
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections. Called on shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("[HttpClient] Shared upstream client closed.")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client. Falls back to creating one lazily so services
+    still work when used outside the FastAPI lifespan (scripts, shells).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
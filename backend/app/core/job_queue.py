@@ -0,0 +1,336 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis backend is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Atomically move the oldest pending job into the in-flight set with its visibility deadline
+_RESERVE_LUA = """
+local id = redis.call('RPOP', KEYS[1])
+if not id then return false end
+redis.call('ZADD', KEYS[2], ARGV[1], id)
+return id
+"""
+
+# Put in-flight jobs whose deadline passed back on the pending list
+_REQUEUE_LUA = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('LPUSH', KEYS[1], id)
+end
+return #ids
+"""
+
+
+class MemoryJobBackend:
+    """In-process job store, used when Redis isn't configured. Jobs don't survive a restart."""
+
+    name = "memory"
+
+    def __init__(self, result_ttl: float):
+        self.result_ttl = result_ttl
+        self._jobs: dict = {}
+        self._pending: deque = deque()
+        self._in_flight: dict = {}
+        self._ready = asyncio.Event()
+
+    async def save(self, job: dict) -> None:
+        self._jobs[job["id"]] = job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    async def enqueue(self, job: dict) -> None:
+        self._jobs[job["id"]] = job
+        self._pending.append(job["id"])
+        self._ready.set()
+
+    async def reserve(self, visibility: float) -> Optional[dict]:
+        while self._pending:
+            job_id = self._pending.popleft()
+            if job_id in self._jobs:
+                self._in_flight[job_id] = time.time() + visibility
+                return self._jobs[job_id]
+        self._ready.clear()
+        return None
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def ack(self, job_id: str) -> None:
+        self._in_flight.pop(job_id, None)
+
+    async def retry(self, job_id: str, delay: float) -> None:
+        # Stays invisible for `delay`, then requeue_expired() picks it up
+        self._in_flight[job_id] = time.time() + delay
+
+    async def requeue_expired(self) -> int:
+        now = time.time()
+        expired = [job_id for job_id, deadline in self._in_flight.items() if deadline <= now]
+        for job_id in expired:
+            del self._in_flight[job_id]
+            self._pending.append(job_id)
+        if expired:
+            self._ready.set()
+
+        # Drop finished jobs once their result TTL has passed
+        cutoff = now - self.result_ttl
+        stale = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in ("done", "failed") and job["updated_at"] < cutoff
+        ]
+        for job_id in stale:
+            del self._jobs[job_id]
+        return len(expired)
+
+    async def depth(self) -> int:
+        return len(self._pending)
+
+    async def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisJobBackend:
+    """
+    Redis job store shared by all API workers:
+    - {ns}:pending     list of job IDs (LPUSH in, RPOP out)
+    - {ns}:in_flight   sorted set of job IDs scored by visibility deadline
+    - {ns}:job:{id}    job record as JSON, expiring result_ttl after it finishes
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, namespace: str, result_ttl: float, poll_interval: float = 0.2):
+        self.namespace = namespace
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._pending_key = f"{namespace}:pending"
+        self._in_flight_key = f"{namespace}:in_flight"
+        self._reserve = self._redis.register_script(_RESERVE_LUA)
+        self._requeue = self._redis.register_script(_REQUEUE_LUA)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.namespace}:job:{job_id}"
+
+    async def ping(self) -> None:
+        await self._redis.ping()
+
+    async def save(self, job: dict) -> None:
+        finished = job["status"] in ("done", "failed")
+        await self._redis.set(
+            self._job_key(job["id"]), json.dumps(job), ex=int(self.result_ttl) if finished else None
+        )
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raw = await self._redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def enqueue(self, job: dict) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._job_key(job["id"]), json.dumps(job))
+            pipe.lpush(self._pending_key, job["id"])
+            await pipe.execute()
+
+    async def reserve(self, visibility: float) -> Optional[dict]:
+        while True:
+            job_id = await self._reserve(keys=[self._pending_key, self._in_flight_key], args=[time.time() + visibility])
+            if not job_id:
+                return None
+            job = await self.get(job_id)
+            if job is not None:
+                return job
+            await self.ack(job_id)
+
+    async def wait(self, timeout: float) -> None:
+        await asyncio.sleep(min(timeout, self.poll_interval))
+
+    async def ack(self, job_id: str) -> None:
+        await self._redis.zrem(self._in_flight_key, job_id)
+
+    async def retry(self, job_id: str, delay: float) -> None:
+        await self._redis.zadd(self._in_flight_key, {job_id: time.time() + delay})
+
+    async def requeue_expired(self) -> int:
+        return int(await self._requeue(keys=[self._pending_key, self._in_flight_key], args=[time.time()]))
+
+    async def depth(self) -> int:
+        return int(await self._redis.llen(self._pending_key))
+
+    async def in_flight(self) -> int:
+        return int(await self._redis.zcard(self._in_flight_key))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class JobQueue:
+    """
+    Background job queue with a worker pool. A reserved job is invisible to
+    other workers for visibility_timeout; if it isn't acked by then (worker
+    crashed or hung) it is handed out again. Failed attempts are retried with
+    backoff up to max_attempts, after which the job is marked failed.
+    Uses Redis when redis_url is set and reachable, otherwise an in-process store.
+    """
+
+    def __init__(self, name: str, handler: Callable[[dict], Awaitable[dict]], redis_url: str = "",
+                 workers: int = 4, visibility_timeout: float = 60.0, max_attempts: int = 3,
+                 retry_backoff: float = 2.0, result_ttl: float = 86400.0):
+        self.name = name
+        self.handler = handler
+        self.redis_url = redis_url
+        self.workers = workers
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self.backend = None
+        self._tasks: list = []
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.backend = await self._create_backend()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        logger.info(f"[JobQueue] {self.name}: {self.workers} workers on {self.backend.name} backend")
+
+    async def _create_backend(self):
+        if self.redis_url and aioredis is not None:
+            backend = RedisJobBackend(self.redis_url, f"mindmate:jobs:{self.name}", self.result_ttl)
+            try:
+                await backend.ping()
+                return backend
+            except Exception as exc:
+                logger.warning(f"[JobQueue] Redis unavailable ({exc}), using in-memory queue")
+                await backend.close()
+        return MemoryJobBackend(self.result_ttl)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.backend is not None:
+            await self.backend.close()
+            self.backend = None
+
+    async def submit(self, payload: dict, job_id: Optional[str] = None) -> str:
+        now = time.time()
+        job = {
+            "id": job_id or str(uuid.uuid4()),
+            "status": "queued",
+            "payload": payload,
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.backend.enqueue(job)
+        return job["id"]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.backend.get(job_id)
+
+    async def _finish(self, job: dict, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        job.update(status=status, result=result, error=error, updated_at=time.time())
+        await self.backend.save(job)
+        await self.backend.ack(job["id"])
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                # A little grace past the handler timeout so a slow attempt is
+                # recorded as a retry before the reaper hands the job out again
+                job = await self.backend.reserve(self.visibility_timeout + 5.0)
+                if job is None:
+                    await self.backend.wait(1.0)
+                    continue
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Backend hiccup (e.g. Redis connection drop): back off and keep going
+                logger.error(f"[JobQueue] {self.name} worker {index} error: {exc}")
+                await asyncio.sleep(1.0)
+
+    async def _process(self, job: dict) -> None:
+        if job["attempts"] >= self.max_attempts:
+            # Redelivered after a crash with no attempts left
+            self.failed += 1
+            await self._finish(job, "failed", error=job.get("error") or "Visibility timeout exceeded.")
+            return
+
+        job.update(status="processing", attempts=job["attempts"] + 1, updated_at=time.time())
+        await self.backend.save(job)
+        try:
+            result = await asyncio.wait_for(self.handler(job["payload"]), self.visibility_timeout)
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"[JobQueue] {self.name} job {job['id']} failed after {job['attempts']} attempts: {error}")
+                self.failed += 1
+                await self._finish(job, "failed", error=error)
+            else:
+                self.retried += 1
+                job.update(status="queued", error=error, updated_at=time.time())
+                await self.backend.save(job)
+                await self.backend.retry(job["id"], self.retry_backoff * 2 ** (job["attempts"] - 1))
+            return
+
+        self.processed += 1
+        await self._finish(job, "done", result=result)
+
+    async def _reaper(self) -> None:
+        interval = max(0.5, min(5.0, self.visibility_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                requeued = await self.backend.requeue_expired()
+                if requeued:
+                    logger.info(f"[JobQueue] {self.name}: requeued {requeued} jobs")
+            except Exception as exc:
+                logger.error(f"[JobQueue] {self.name} reaper error: {exc}")
+
+    async def stats(self) -> dict:
+        if self.backend is None:
+            return {"running": False}
+        try:
+            depth, in_flight = await self.backend.depth(), await self.backend.in_flight()
+        except Exception as exc:
+            logger.warning(f"[JobQueue] {self.name} stats failed: {exc}")
+            depth = in_flight = None
+        return {
+            "running": self.running,
+            "backend": self.backend.name,
+            "workers": self.workers,
+            "depth": depth,
+            "in_flight": in_flight,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
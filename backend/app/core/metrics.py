@@ -0,0 +1,134 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Buckets sized for this service: sub-10ms cache/lexicon hits up to 30s+ LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "mindmate_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "mindmate_upstream_request_duration_seconds",
+    "Latency of calls to upstream models.",
+    ["upstream", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+UPSTREAM_CALLS = Counter(
+    "mindmate_upstream_requests_total",
+    "Upstream model calls by outcome (ok, 4xx, 5xx, model_error, loading, timeout, error).",
+    ["upstream", "model", "status"],
+)
+
+STAGE_LATENCY = Histogram(
+    "mindmate_pipeline_stage_duration_seconds",
+    "Time spent in each stage of a request pipeline.",
+    ["pipeline", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+VERDICTS = Counter(
+    "mindmate_analysis_verdicts_total",
+    "Moderation / sentiment verdicts by where they came from (emoji, lexicon, cache, ensemble).",
+    ["analyzer", "source", "label"],
+)
+
+MODEL_VOTES = Counter(
+    "mindmate_ensemble_model_votes_total",
+    "Per-model ensemble votes, split by whether they matched the final verdict.",
+    ["analyzer", "model", "agreed"],
+)
+
+ENSEMBLE_AGREEMENT = Histogram(
+    "mindmate_ensemble_agreement_ratio",
+    "Share of responding models that voted for the final verdict, per ensemble run.",
+    ["analyzer"],
+    buckets=(0.25, 0.34, 0.5, 0.67, 0.75, 0.99, 1.0),
+)
+
+
+def call_status(response: Optional[httpx.Response] = None, exc: Optional[BaseException] = None,
+                ok: bool = True) -> str:
+    """Outcome label for an upstream call."""
+    if exc is not None:
+        return "timeout" if isinstance(exc, httpx.TimeoutException) else "error"
+    if response is not None and response.status_code >= 400:
+        return f"{response.status_code // 100}xx"
+    return "ok" if ok else "model_error"
+
+
+def observe_upstream(upstream: str, model: str, status: str, seconds: float) -> None:
+    UPSTREAM_LATENCY.labels(upstream, model).observe(seconds)
+    UPSTREAM_CALLS.labels(upstream, model, status).inc()
+
+
+@contextmanager
+def stage(pipeline: str, name: str):
+    """Time a pipeline stage, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(pipeline, name).observe(time.perf_counter() - start)
+
+
+def observe_verdict(analyzer: str, source: str, label: str) -> None:
+    VERDICTS.labels(analyzer, source, label).inc()
+
+
+def observe_agreement(analyzer: str, votes: dict, final_label: str) -> None:
+    """votes maps model -> label for the models that answered."""
+    if not votes:
+        return
+    agreed = 0
+    for model, label in votes.items():
+        match = label == final_label
+        agreed += match
+        MODEL_VOTES.labels(analyzer, model, "true" if match else "false").inc()
+    ENSEMBLE_AGREEMENT.labels(analyzer).observe(agreed / len(votes))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template (e.g.
+    /moderation/jobs/{job_id}), so label cardinality stays bounded.
+    Streaming responses are timed until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            if path != "/metrics":
+                REQUEST_LATENCY.labels(scope["method"], path, str(status["code"])).observe(
+                    time.perf_counter() - start
+                )
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
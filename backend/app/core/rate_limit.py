@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis state is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Refill-then-take `cost` tokens from a bucket stored as a hash {tokens, ts}.
+# Uses the Redis clock so every API worker sees the same time.
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+# Take a concurrency lease if fewer than `limit` unexpired leases are held
+_LEASE_ACQUIRE_LUA = """
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now + ttl, ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class TooManyRequests(HTTPException):
+    """429 with a Retry-After header (whole seconds, at least 1)."""
+
+    def __init__(self, detail: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+
+class RateLimitExceeded(TooManyRequests):
+    pass
+
+
+class UpstreamBusyError(TooManyRequests):
+    pass
+
+
+def parse_rate_limits(spec: str) -> dict:
+    """'chat=20/60,mood=30/60' -> {'chat': (20, 60.0), 'mood': (30, 60.0)}."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        count, _, period = value.partition("/")
+        limits[name.strip()] = (int(count), float(period or 1))
+    return limits
+
+
+def parse_concurrency(spec: str) -> dict:
+    """'gemini=16,hf=32' -> {'gemini': 16, 'hf': 32}."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+def _redis_client(url: str):
+    if not url or aioredis is None:
+        return None
+    return aioredis.from_url(url, decode_responses=True)
+
+
+class RateLimiter:
+    """
+    Token-bucket limits per route and identity. Each route allows `count`
+    requests per `period`, refilled continuously, with bursts up to `count`.
+    Buckets live in Redis when configured (shared by all workers); if Redis
+    is missing or failing, an in-process LRU of buckets is used instead.
+    """
+
+    def __init__(self, limits: dict, redis_url: str = "", max_local_keys: int = 50000,
+                 namespace: str = "mindmate:ratelimit"):
+        self.limits = limits
+        self.max_local_keys = max_local_keys
+        self.namespace = namespace
+        self._redis = _redis_client(redis_url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA) if self._redis is not None else None
+        self._local: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _take_local(self, key: str, capacity: float, rate: float, cost: float) -> float:
+        now = time.monotonic()
+        tokens, ts = self._local.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        self._local[key] = (tokens, now)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local_keys:
+            self._local.popitem(last=False)
+        return retry_after
+
+    async def _take(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        """Take `cost` tokens; returns 0 when allowed, else seconds until enough are available."""
+        if self._script is not None:
+            try:
+                allowed, retry_after = await self._script(keys=[f"{self.namespace}:{key}"], args=[capacity, rate, cost])
+                return 0.0 if int(allowed) else float(retry_after)
+            except Exception as exc:
+                logger.warning(f"[RateLimiter] Redis unavailable, using local buckets: {exc}")
+        return self._take_local(key, capacity, rate, cost)
+
+    async def hit(self, route: str, identity: str, scale: float = 1.0, cost: int = 1) -> None:
+        """
+        Count a request worth `cost` units (e.g. texts in a batch); raises
+        RateLimitExceeded when the bucket doesn't hold that many tokens.
+        """
+        limit = self.limits.get(route)
+        if limit is None:
+            return
+        count, period = limit
+        capacity = count * scale
+        retry_after = await self._take(f"{route}:{identity}", capacity, capacity / period, cost)
+        if retry_after > 0:
+            self.rejected += 1
+            raise RateLimitExceeded("Too many requests, please slow down.", retry_after)
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "local_keys": len(self._local),
+            "redis_enabled": self._redis is not None,
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+            self._script = None
+
+
+class UpstreamGovernor:
+    """
+    Caps concurrent calls per upstream (Gemini, HF, Whisper) across the service.
+    Callers beyond the cap wait up to queue_timeout for a slot; if the wait
+    queue is full or the wait times out, UpstreamBusyError (429) is raised.
+    With Redis, slots are leases in a sorted set that expire after lease_ttl
+    so a crashed worker can't hold them forever; otherwise a local semaphore.
+    """
+
+    def __init__(self, limits: dict, redis_url: str = "", queue_timeout: float = 5.0,
+                 max_queue: int = 64, lease_ttl: float = 120.0, namespace: str = "mindmate:upstream"):
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.lease_ttl = lease_ttl
+        self.namespace = namespace
+        self._redis = _redis_client(redis_url)
+        self._script = self._redis.register_script(_LEASE_ACQUIRE_LUA) if self._redis is not None else None
+        self._semaphores = {name: asyncio.Semaphore(limit) for name, limit in limits.items()}
+        self._waiting = {name: 0 for name in limits}
+        self._active = {name: 0 for name in limits}
+        self.shed = {name: 0 for name in limits}
+
+    def _busy(self, name: str) -> UpstreamBusyError:
+        self.shed[name] += 1
+        logger.warning(f"[UpstreamGovernor] Shedding {name} call, at capacity")
+        return UpstreamBusyError("Service is busy, please retry shortly.", self.queue_timeout)
+
+    async def _acquire_redis(self, name: str, deadline: float) -> Optional[str]:
+        """Poll for a Redis lease until deadline. None means Redis failed (use local)."""
+        lease_id = str(uuid.uuid4())
+        key = f"{self.namespace}:{name}"
+        delay = 0.02
+        while True:
+            try:
+                if int(await self._script(keys=[key], args=[self.limits[name], self.lease_ttl, lease_id])):
+                    return lease_id
+            except Exception as exc:
+                logger.warning(f"[UpstreamGovernor] Redis unavailable, using local limit: {exc}")
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._busy(name)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.2)
+
+    async def acquire(self, name: str):
+        """Take a slot for upstream `name`. Returns a lease to pass to release()."""
+        if name not in self.limits:
+            return None
+        if self._waiting[name] >= self.max_queue:
+            raise self._busy(name)
+
+        self._waiting[name] += 1
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            lease = None
+            if self._script is not None:
+                lease_id = await self._acquire_redis(name, deadline)
+                if lease_id is not None:
+                    lease = ("redis", name, lease_id)
+            if lease is None:
+                try:
+                    await asyncio.wait_for(self._semaphores[name].acquire(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise self._busy(name)
+                lease = ("local", name, None)
+        finally:
+            self._waiting[name] -= 1
+        self._active[name] += 1
+        return lease
+
+    async def release(self, lease) -> None:
+        if lease is None:
+            return
+        backend, name, lease_id = lease
+        self._active[name] -= 1
+        if backend == "local":
+            self._semaphores[name].release()
+            return
+        try:
+            await self._redis.zrem(f"{self.namespace}:{name}", lease_id)
+        except Exception as exc:
+            # The lease expires on its own after lease_ttl
+            logger.warning(f"[UpstreamGovernor] Failed to release {name} lease: {exc}")
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        lease = await self.acquire(name)
+        try:
+            yield
+        finally:
+            await self.release(lease)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "limit": limit,
+                "active": self._active[name],
+                "waiting": self._waiting[name],
+                "shed": self.shed[name],
+            }
+            for name, limit in self.limits.items()
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+            self._script = None
+
+
+def client_ip(request: HTTPConnection, trusted_proxies: int = None) -> str:
+    """
+    The client address as seen by the outermost of our TRUSTED_PROXY_COUNT
+    proxies. Each proxy appends the address it received the request from, so
+    that is the entry trusted_proxies from the right; anything further left
+    was sent by the client and can be forged.
+    """
+    trusted_proxies = settings.TRUSTED_PROXY_COUNT if trusted_proxies is None else trusted_proxies
+    peer = request.client.host if request.client else "unknown"
+    if trusted_proxies <= 0:
+        return peer
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if len(hops) < trusted_proxies:
+        # Didn't come through all of our proxies, so the header can't be trusted
+        return peer
+    return hops[-trusted_proxies]
+
+
+async def enforce_rate_limit(route: str, user_id: Optional[str], ip: str, cost: int = 1) -> None:
+    """
+    Apply the route's limit to the user (when known) and, at
+    RATE_LIMIT_IP_MULTIPLIER times the limit, to the client IP so rotating
+    user IDs doesn't get around it. `cost` is the request's size in units.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    if user_id:
+        await rate_limiter.hit(route, f"user:{user_id}", cost=cost)
+    await rate_limiter.hit(route, f"ip:{ip}", scale=settings.RATE_LIMIT_IP_MULTIPLIER, cost=cost)
+
+
+rate_limiter = RateLimiter(
+    parse_rate_limits(settings.RATE_LIMITS),
+    redis_url=settings.REDIS_URL,
+)
+
+upstream_governor = UpstreamGovernor(
+    parse_concurrency(settings.UPSTREAM_CONCURRENCY) if settings.UPSTREAM_GOVERNOR_ENABLED else {},
+    redis_url=settings.REDIS_URL,
+    queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT,
+    max_queue=settings.UPSTREAM_MAX_QUEUE,
+    lease_ttl=settings.UPSTREAM_LEASE_TTL,
+)
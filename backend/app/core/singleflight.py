@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the
+    work as its own task, and every caller with that key (the first included)
+    awaits it. Results and errors are shared; nothing is kept once the call
+    finishes, so this only removes duplicate in-flight work.
+
+    Cancellation: a caller that is cancelled stops waiting without cancelling
+    the shared task, as long as someone else is still waiting for it. When the
+    last waiter goes away, the task is cancelled and forgotten, so a new caller
+    starts fresh instead of joining a dying call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}
+        self._waiters: dict = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            remaining = self._waiters[task] - 1
+            if remaining:
+                self._waiters[task] = remaining
+            else:
+                del self._waiters[task]
+                if not task.done():
+                    logger.debug(f"[SingleFlight] {self.name}: all callers gone, cancelling")
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
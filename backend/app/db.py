@@ -0,0 +1,80 @@
+import logging
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def async_database_url(url: str) -> str:
+    """Map plain driver URLs (as given by Supabase / docker-compose) to their async drivers."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://") and not url.startswith("sqlite+"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def create_engine_from_settings(url: Optional[str] = None) -> AsyncEngine:
+    url = async_database_url(url or settings.DATABASE_URL)
+    kwargs = {"echo": settings.DATABASE_ECHO}
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+        )
+    return create_async_engine(url, **kwargs)
+
+
+def run_migrations(connection) -> None:
+    """Upgrade the schema to the latest Alembic revision over an open sync connection."""
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+async def init_db(url: Optional[str] = None) -> AsyncEngine:
+    """Create the pooled async engine and migrate the schema. Called from the app lifespan."""
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine_from_settings(url)
+        _session_factory = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+        if settings.DATABASE_MIGRATE_ON_STARTUP:
+            async with _engine.begin() as conn:
+                await conn.run_sync(run_migrations)
+        logger.info(f"[DB] Engine ready ({_engine.url.get_backend_name()})")
+    return _engine
+
+
+async def close_db() -> None:
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_factory = None
+
+
+def get_session_factory() -> async_sessionmaker:
+    if _session_factory is None:
+        raise RuntimeError("Database not initialized, call init_db() first.")
+    return _session_factory
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency yielding an AsyncSession from the pool."""
+    async with get_session_factory()() as session:
+        yield session
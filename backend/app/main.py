@@ -1,20 +1,63 @@
 import os
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.config import settings
+from app.core.http_client import init_http_client, close_http_client
+from app.db import init_db, close_db
+from app.services.mood_service import mood_write_queue
+from app.core.cache import verdict_cache
+from app.core.circuit_breaker import scoreboard
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.rate_limit import rate_limiter, upstream_governor
+from app.services.hf_inference import close_batchers
+from app.services.moderation_jobs import moderation_queue
+from app.services.model_warmup import model_warmer
+from app.services.moderation_service import sentiment_flights, toxicity_flights
+
 from app.api.routes_peer import router as peer_router
 from app.api.routes_mood import router as mood_router
 from app.api.routes_chat import router as chat_router
 from app.api.routes_transcribe import router as transcribe_router
 from app.api.chat_voice import router as voice_router
 from app.api.routes_comment import router as comment_router
+from app.api.routes_moderation import router as moderation_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client (HF, Gemini) shared by every service
+    app.state.http_client = await init_http_client()
+    await init_db()
+    if settings.MOOD_WRITE_BEHIND:
+        mood_write_queue.start()
+    if settings.MODERATION_ASYNC:
+        await moderation_queue.start()
+    # Keep HF models loaded so the first users of the day don't hit cold starts
+    if settings.HF_WARMUP_ENABLED and settings.HF_API_KEY:
+        model_warmer.start()
+    try:
+        yield
+    finally:
+        await model_warmer.close()
+        await moderation_queue.stop()
+        await mood_write_queue.stop()
+        await close_db()
+        await close_batchers()
+        await verdict_cache.close()
+        await rate_limiter.close()
+        await upstream_governor.close()
+        await close_http_client()
+
 
 app = FastAPI(
     title="MindMate API",
     description="Backend API for MindMate mental health platform",
     version="1.0.0",
-    root_path=os.environ.get("RENDER_EXTERNAL_URL", "")
+    root_path=os.environ.get("RENDER_EXTERNAL_URL", ""),
+    lifespan=lifespan
 )
 
 
@@ -42,12 +85,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms, exposed at /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(peer_router)
 app.include_router(mood_router)
 app.include_router(chat_router)
 app.include_router(transcribe_router)
 app.include_router(voice_router)
 app.include_router(comment_router)
+app.include_router(moderation_router)
 
 @app.get("/")
 async def root():
@@ -55,7 +103,23 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "environment": ENVIRONMENT}
+    return {
+        "status": "healthy",
+        "environment": ENVIRONMENT,
+        "verdict_cache": verdict_cache.stats(),
+        "upstreams": scoreboard.snapshot(),
+        "hf_models": model_warmer.snapshot(),
+        "singleflight": {"toxicity": toxicity_flights.stats(), "sentiment": sentiment_flights.stats()},
+        "moderation_queue": await moderation_queue.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "upstream_governor": upstream_governor.stats()
+    }
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        data, content_type = render_metrics()
+        return Response(content=data, media_type=content_type)
 
 if __name__ == "__main__":
     uvicorn.run(
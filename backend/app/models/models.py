@@ -1,6 +1,41 @@
 
+import uuid
+from datetime import date, datetime, timezone
 from pydantic import BaseModel, Field as PydanticField
+from sqlalchemy import DateTime, Index
+from sqlmodel import SQLModel, Field
 from typing import Optional
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Database tables
+class MoodEntry(SQLModel, table=True):
+    """Analyzed text mood entry. The frontend's Supabase `mood_entries` table (slider values) is separate."""
+    __tablename__ = "mood_text_entries"
+    __table_args__ = (Index("ix_mood_text_entries_user_created", "user_id", "created_at"),)
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True, max_length=36)
+    user_id: Optional[str] = Field(default=None, max_length=64)
+    mood_text: str
+    mood_label: str = Field(max_length=16)
+    confidence: float
+    created_at: datetime = Field(default_factory=_utcnow, sa_type=DateTime(timezone=True))
+
+
+class MoodDailyRollup(SQLModel, table=True):
+    """Per-user, per-day, per-label aggregate kept up to date on every mood insert."""
+    __tablename__ = "mood_daily_rollups"
+
+    # Only entries with a user_id are rolled up; anonymous ones have no owner to show them to
+    user_id: str = Field(primary_key=True, max_length=64)
+    day: date = Field(primary_key=True)
+    mood_label: str = Field(primary_key=True, max_length=16)
+    count: int = 0
+    confidence_sum: float = 0.0
+
 class PeerPostRequest(BaseModel):
     user_id: Optional[str] = PydanticField(None, description="User ID")
     content: str = PydanticField(..., min_length=1, description="Text content to be moderated. Can include emojis.")
@@ -1,10 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 class ModerateRequest(BaseModel):
     text: str
 
 class ModerateResponse(BaseModel):
     status: str
+    label: Optional[str] = None
+    score: Optional[float] = None
+    source: Optional[str] = None
+    error: Optional[str] = None
+
+class ModerateBatchRequest(BaseModel):
+    texts: list[str] = Field(..., min_length=1, description="Texts to moderate, results come back in this order.")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Concurrent ensemble runs (defaults to MODERATION_BATCH_CONCURRENCY).")
+
+class ModerateBatchItem(ModerateResponse):
+    index: int
 
 class MoodRequest(BaseModel):
     emoji: str
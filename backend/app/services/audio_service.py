@@ -0,0 +1,257 @@
+import asyncio
+import io
+import logging
+import shutil
+import wave
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WAV_CONTENT_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+DECODE_SAMPLE_RATE = 16000
+
+
+def decode_wav(data: bytes) -> Optional[tuple[np.ndarray, int]]:
+    """
+    Decode PCM WAV bytes into float32 samples in [-1, 1], shaped (frames, channels).
+    Returns None when the bytes are not a PCM WAV file we can read.
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        return None
+
+    return samples.reshape(-1, channels), rate
+
+
+async def decode_with_ffmpeg(data: bytes, sample_rate: int = DECODE_SAMPLE_RATE) -> Optional[tuple[np.ndarray, int]]:
+    """Decode compressed audio (webm/ogg/mp3/m4a) to mono PCM via ffmpeg, if installed."""
+    if shutil.which("ffmpeg") is None:
+        return None
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate(data)
+    if proc.returncode != 0:
+        logger.warning(f"[AudioService] ffmpeg decode failed: {err.decode(errors='ignore')[:200]}")
+        return None
+    samples = np.frombuffer(out, dtype="<i2").astype(np.float32) / 32768.0
+    return samples.reshape(-1, 1), sample_rate
+
+
+async def decode_audio(data: bytes, content_type: str) -> Optional[tuple[np.ndarray, int]]:
+    """Decode audio bytes to mono float32 samples. None if the format can't be decoded here."""
+    decoded = decode_wav(data) if content_type in WAV_CONTENT_TYPES else None
+    if decoded is None:
+        decoded = await decode_with_ffmpeg(data)
+    if decoded is None:
+        return None
+    samples, rate = decoded
+    return samples.mean(axis=1).astype(np.float32), rate
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono float32 samples as 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def frame_energy(samples: np.ndarray, sample_rate: int, frame_ms: int = 30) -> tuple[np.ndarray, int]:
+    """RMS energy per fixed-size frame. Returns (energies, frame_length_in_samples)."""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), frame_len
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1)), frame_len
+
+
+def split_on_silence(samples: np.ndarray, sample_rate: int, target_seconds: float,
+                     overlap_seconds: float, search_seconds: float) -> list[tuple[int, int]]:
+    """
+    Split audio into windows of about target_seconds, cutting at the quietest
+    frame within +/- search_seconds of each ideal cut point. Consecutive
+    windows overlap by overlap_seconds so words on a boundary aren't lost.
+    Returns (start, end) sample indices.
+    """
+    total = len(samples)
+    target = int(target_seconds * sample_rate)
+    if total <= target:
+        return [(0, total)]
+
+    energies, frame_len = frame_energy(samples, sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    search = int(search_seconds * sample_rate)
+
+    windows = []
+    start = 0
+    while start < total:
+        ideal = start + target
+        if ideal >= total:
+            windows.append((start, total))
+            break
+        lo = max(start + target // 2, ideal - search) // frame_len
+        hi = min(min(total, ideal + search) // frame_len, len(energies))
+        if hi > lo:
+            cut = (lo + int(np.argmin(energies[lo:hi]))) * frame_len + frame_len // 2
+        else:
+            cut = ideal
+        windows.append((start, cut))
+        start = max(cut - overlap, start + 1)
+    return windows
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """
+    Resample mono audio with linear interpolation. When downsampling, a
+    moving-average low-pass is applied first to limit aliasing.
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    if src_rate > dst_rate:
+        width = int(round(src_rate / dst_rate))
+        if width > 1:
+            kernel = np.ones(width, dtype=np.float32) / width
+            samples = np.convolve(samples, kernel, mode="same")
+    duration = len(samples) / src_rate
+    n_out = int(round(duration * dst_rate))
+    src_t = np.arange(len(samples), dtype=np.float64) / src_rate
+    dst_t = np.arange(n_out, dtype=np.float64) / dst_rate
+    return np.interp(dst_t, src_t, samples).astype(np.float32)
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int, threshold_db: float,
+                 pad_ms: int = 200) -> np.ndarray:
+    """
+    Energy-based VAD: drop leading and trailing frames whose RMS is below
+    threshold_db (dBFS). Returns an empty array when nothing is above it.
+    """
+    energies, frame_len = frame_energy(samples, sample_rate)
+    if len(energies) == 0:
+        return samples[:0]
+    threshold = 10 ** (threshold_db / 20.0)
+    voiced = np.flatnonzero(energies >= threshold)
+    if len(voiced) == 0:
+        return samples[:0]
+    pad = int(sample_rate * pad_ms / 1000)
+    start = max(0, voiced[0] * frame_len - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame_len + pad)
+    return samples[start:end]
+
+
+def normalize_samples(samples: np.ndarray, sample_rate: int, target_rate: int,
+                      threshold_db: float) -> Optional[np.ndarray]:
+    """Mono samples -> target_rate with silence trimmed. None if the clip is silent."""
+    samples = resample(samples, sample_rate, target_rate)
+    samples = trim_silence(samples, target_rate, threshold_db)
+    if len(samples) == 0:
+        return None
+    return samples
+
+
+def normalize_wav(data: bytes, target_rate: int, threshold_db: float) -> tuple[Optional[bytes], bool]:
+    """
+    Downmix PCM WAV to mono, resample to target_rate and trim silence.
+    Returns (wav_bytes, is_silent); wav_bytes is the input unchanged if it
+    isn't a WAV we can decode.
+    """
+    decoded = decode_wav(data)
+    if decoded is None:
+        return data, False
+    samples, rate = decoded
+    mono = samples.mean(axis=1).astype(np.float32)
+    normalized = normalize_samples(mono, rate, target_rate, threshold_db)
+    if normalized is None:
+        return None, True
+    return encode_wav(normalized, target_rate), False
+
+
+class SpeechSegmenter:
+    """
+    Incremental energy-based segmenter for live audio. Feed mono float32
+    samples as they arrive; a segment is emitted once voiced audio is
+    followed by silence_ms of silence, or when it reaches max_seconds.
+    """
+
+    def __init__(self, sample_rate: int, threshold_db: float, silence_ms: int = 600,
+                 max_seconds: float = 15.0, pad_ms: int = 200):
+        self.sample_rate = sample_rate
+        self.threshold = 10 ** (threshold_db / 20.0)
+        self.silence_ms = silence_ms
+        self.max_samples = int(max_seconds * sample_rate)
+        self.pad = int(sample_rate * pad_ms / 1000)
+        self._buffer = np.zeros(0, dtype=np.float32)
+
+    def feed(self, samples: np.ndarray) -> list[np.ndarray]:
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32)])
+        segments = []
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                break
+            segments.append(segment)
+        return segments
+
+    def _next_segment(self) -> Optional[np.ndarray]:
+        energies, frame_len = frame_energy(self._buffer, self.sample_rate)
+        if len(energies) == 0:
+            return None
+        voiced = np.flatnonzero(energies >= self.threshold)
+
+        if len(voiced) == 0:
+            # Only silence so far: keep a short tail as lead-in for the next word
+            if len(self._buffer) > self.pad:
+                self._buffer = self._buffer[-self.pad:]
+            return None
+
+        frame_ms = frame_len * 1000 / self.sample_rate
+        trailing_silence_ms = (len(energies) - 1 - voiced[-1]) * frame_ms
+        if trailing_silence_ms >= self.silence_ms:
+            cut = min(len(self._buffer), (voiced[-1] + 1) * frame_len + self.pad)
+        elif len(self._buffer) >= self.max_samples:
+            cut = self.max_samples
+        else:
+            return None
+
+        segment = self._buffer[:cut]
+        self._buffer = self._buffer[cut:]
+        return segment
+
+    def flush(self) -> list[np.ndarray]:
+        """Return whatever voiced audio is still buffered (end of speech)."""
+        remaining = self._buffer
+        self._buffer = np.zeros(0, dtype=np.float32)
+        energies, _ = frame_energy(remaining, self.sample_rate)
+        if len(energies) == 0 or not np.any(energies >= self.threshold):
+            return []
+        return [remaining]
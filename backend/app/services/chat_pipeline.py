@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import STAGE_LATENCY, stage
+from app.core.rate_limit import upstream_governor
+from app.services.moderation_service import moderate_text
+from app.services.gemini_service import get_gemini_response, stream_gemini_response
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class MessageFlaggedError(Exception):
+    """The user's message failed moderation; no AI output may be returned."""
+
+    def __init__(self, label: str, score: float):
+        super().__init__("Message flagged as toxic. Please rephrase.")
+        self.label = label
+        self.score = score
+
+
+async def _moderate(text: str, pipeline: str = "chat"):
+    # Lexicon hits aren't final here: "someone told me to kill myself" needs support, not a block
+    with stage(pipeline, "moderate"):
+        label, score = await moderate_text(text, lexicon_blocks=False)
+    if label == "toxic":
+        raise MessageFlaggedError(label, score)
+    return label, score
+
+
+async def moderated_reply(text: str, messages: list, user_id: Optional[str] = None,
+                          pipeline: str = "chat") -> str:
+    """
+    Moderate `text` and generate the reply for `messages`.
+    With CHAT_SPECULATIVE_GENERATION, generation starts alongside moderation
+    and is cancelled if the message is flagged, so latency is
+    max(moderation, generation) and unmoderated output never escapes.
+    Raises MessageFlaggedError for toxic messages, and UpstreamBusyError when
+    no Gemini slot frees up in time.
+    Stage timings are recorded under `pipeline`.
+    """
+    if not settings.CHAT_SPECULATIVE_GENERATION:
+        await _moderate(text, pipeline)
+        async with upstream_governor.slot("gemini"):
+            with stage(pipeline, "generate"):
+                return await get_gemini_response(messages, user_id)
+
+    async with upstream_governor.slot("gemini"):
+        with stage(pipeline, "generate"):
+            generation = asyncio.create_task(get_gemini_response(messages, user_id))
+            try:
+                await _moderate(text, pipeline)
+            except BaseException:
+                generation.cancel()
+                raise
+            return await generation
+
+
+class SpeculativeStream:
+    """
+    Starts streaming the Gemini reply into a buffer right away. Nothing is
+    handed out until release() is called after moderation passes; cancel()
+    drops the buffered output.
+    """
+
+    def __init__(self, messages: list, user_id: Optional[str] = None):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._produce(messages, user_id))
+
+    async def _produce(self, messages: list, user_id: Optional[str]):
+        try:
+            async for chunk in stream_gemini_response(messages, user_id):
+                await self._queue.put(chunk)
+        except Exception as exc:
+            await self._queue.put(exc)
+        finally:
+            await self._queue.put(_END)
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def release(self):
+        """Yield buffered and incoming chunks in order."""
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._task.cancel()
+
+
+async def moderated_stream(text: str, messages: list, user_id: Optional[str] = None,
+                           pipeline: str = "chat"):
+    """
+    Moderate `text`, then return an async iterator over the reply chunks.
+    With CHAT_SPECULATIVE_GENERATION the stream is already filling while
+    moderation runs. Raises MessageFlaggedError before any chunk is exposed,
+    and UpstreamBusyError before anything starts if Gemini is at capacity.
+    The Gemini slot is held until the returned iterator finishes; the
+    "generate" stage is timed from when generation starts until then.
+    """
+    lease = await upstream_governor.acquire("gemini")
+    try:
+        if not settings.CHAT_SPECULATIVE_GENERATION:
+            await _moderate(text, pipeline)
+            started = time.perf_counter()
+            return _holding(lease, stream_gemini_response(messages, user_id), pipeline, started)
+
+        started = time.perf_counter()
+        stream = SpeculativeStream(messages, user_id)
+        try:
+            await _moderate(text, pipeline)
+        except BaseException:
+            stream.cancel()
+            raise
+        return _holding(lease, stream.release(), pipeline, started)
+    except BaseException:
+        await upstream_governor.release(lease)
+        raise
+
+
+async def _holding(lease, chunks, pipeline: str, started: float):
+    """Pass chunks through, releasing the upstream slot when the stream ends."""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        STAGE_LATENCY.labels(pipeline, "generate").observe(time.perf_counter() - started)
+        await upstream_governor.release(lease)
@@ -1,14 +1,25 @@
 import os
-import httpx
+import json
+import time
 import logging
+import httpx
+from typing import Optional
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.circuit_breaker import scoreboard
+from app.core.metrics import call_status, observe_upstream
+from app.services.hf_inference import HF_INFERENCE_URL, model_warmth, note_hf_response
+from app.services.provider_router import race_providers
+from app.services.prompt_builder import build_flat_prompt, build_gemini_payload
 
 logger = logging.getLogger(__name__)
 
 # Google Gemini Flash endpoint and model
-GEMINI_API_URL = (
-    "https://generativelanguage.googleapis.com/v1beta/models/"
-    "gemini-1.5-flash-latest:generateContent"
-)
+GEMINI_BASE_URL = settings.GEMINI_BASE_URL
+GEMINI_MODEL = "gemini-1.5-flash-latest"
+GEMINI_API_URL = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:generateContent"
+GEMINI_STREAM_URL = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:streamGenerateContent"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # Hugging Face fallback
@@ -20,133 +31,239 @@ HF_MODELS = [
 ]
 
 
-
 def build_prompt(messages: list, user_id: str = None) -> str:
     """
-    Build context-aware prompt for Bangladeshi university students, using last 5 messages in memory.
+    Build the flat context-aware prompt (system prompt + trimmed history) used by
+    the Hugging Face fallback models.
     """
-    system_prompt = (
-        "You are **MindMate**, an empathetic and trustworthy AI mental health "
-        "companion created to support **Bangladeshi university students**. "
-        "Your role is to provide a safe, judgment-free space where students feel "
-        "heard, understood, and encouraged. You are not a doctor, but a caring "
-        "peer who listens deeply and offers gentle, practical guidance.\n\n"
-
-        "### Context\n"
-        "- Many students in Bangladesh experience intense academic pressure, "
-        "family expectations, financial stress, social stigma, and limited access "
-        "to mental health resources.\n"
-        "- They may feel isolated or unable to openly discuss their struggles.\n"
-        "- Your purpose is to make them feel less alone, more hopeful, and more confident "
-        "in handling daily challenges.\n\n"
-
-        "### Tone & Personality\n"
-        "- Warm, caring, and approachable — like a close friend who listens without judgment.\n"
-        "- Simple, clear, student-friendly language (avoid technical or medical jargon).\n"
-        "- Always respectful of culture, family values, and social realities in Bangladesh.\n"
-        "- Encourage small, achievable steps instead of overwhelming advice.\n\n"
-
-        "### Core Principles\n"
-        "1. **Empathy First** – Acknowledge and validate the student’s feelings before offering advice.\n"
-        "2. **Cultural Awareness** – Relate advice to Bangladeshi student life "
-        "(e.g., exam prep, balancing family duties, hostel challenges, financial struggles).\n"
-        "3. **Practical Support** – Share actionable, realistic suggestions "
-        "students can try immediately.\n"
-        "4. **Safety Boundaries** – Never provide medical diagnoses, prescriptions, "
-        "or harmful content. If someone is in serious distress, gently encourage reaching out "
-        "to trusted people or professionals.\n"
-        "5. **Positivity with Depth** – Inspire confidence and hope, but never dismiss struggles.\n\n"
-
-        "### Response Style\n"
-        "- Begin with an empathetic reflection of what the student feels.\n"
-        "- Offer supportive, culturally relevant insights.\n"
-        "- Suggest one or two small, practical next steps.\n"
-        "- End with encouragement, reminding them they are not alone.\n\n"
-
-        "Your mission: make every student feel **valued, understood, and gently guided** "
-        "with compassion, cultural awareness, and warmth."
+    return build_flat_prompt(
+        messages,
+        user_id,
+        token_budget=settings.GEMINI_HISTORY_TOKEN_BUDGET,
+        max_message_tokens=settings.GEMINI_MAX_MESSAGE_TOKENS
+    )
+
+
+def build_payload(messages: list, user_id: str = None) -> dict:
+    """Role-tagged Gemini request body within the configured history token budget."""
+    return build_gemini_payload(
+        messages,
+        user_id,
+        token_budget=settings.GEMINI_HISTORY_TOKEN_BUDGET,
+        max_message_tokens=settings.GEMINI_MAX_MESSAGE_TOKENS
     )
 
-    user_context = f"User ID: {user_id}. " if user_id else ""
-    history = ""
-    for msg in messages[-5:]:
-        sender = "Student" if getattr(msg, "sender", None) == "user" else "MindMate"
-        text = getattr(msg, "text", "")
-        history += f"{sender} :{text}\n"
-    return f"{system_prompt}\n{user_context}{history}"
 
+def _failure_status(exc: Exception) -> str:
+    # raise_for_status() errors carry the response, so they're labelled 4xx/5xx
+    return call_status(getattr(exc, "response", None), exc=None if isinstance(exc, httpx.HTTPStatusError) else exc)
+
+
+async def call_gemini(client, payload: dict) -> Optional[str]:
+    """Single Gemini generateContent call. Returns None on failure."""
+    # Claimed here rather than when routing, so a provider the race never starts holds no probe
+    if not scoreboard.allow("gemini"):
+        return None
+    start = time.monotonic()
+    try:
+        logger.info(f"[GeminiService] Sending prompt to Gemini Flash...")
+        resp = await client.post(
+            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
+            json=payload,
+            timeout=15.0
+        )
+        logger.info(f"[GeminiService] Gemini status: {resp.status_code}")
+        resp.raise_for_status()
+        scoreboard.record("gemini", ok=True, latency=time.monotonic() - start)
+        observe_upstream("gemini", GEMINI_MODEL, "ok", time.monotonic() - start)
+
+        gemini_json = resp.json()
+        candidates = gemini_json.get("candidates", [])
+        if candidates and "content" in candidates[0]:
+            parts = candidates[0]["content"].get("parts", [])
+            if parts and "text" in parts[0]:
+                return parts[0]["text"]
+
+        return "Hi! I’m MindMate. How are you feeling today?"
+
+    except Exception as gemini_exc:
+        logger.error(f"[GeminiService] Gemini error: {gemini_exc}", exc_info=True)
+        scoreboard.record("gemini", ok=False, latency=time.monotonic() - start)
+        observe_upstream("gemini", GEMINI_MODEL, _failure_status(gemini_exc), time.monotonic() - start)
+        return None
+
+
+async def call_hf_model(client, hf_model: str, full_prompt: str) -> Optional[str]:
+    """Single Hugging Face text-generation call. Returns None on failure."""
+    start = time.monotonic()
+    try:
+        hf_url = f"{HF_INFERENCE_URL}/{hf_model}"
+        hf_headers = {"Authorization": f"Bearer {HF_API_KEY}"}
+        hf_payload = {"inputs": full_prompt}
+        # A loading model that can't be ready in time is skipped, not counted as a failure
+        eta = model_warmth.eta(hf_model)
+        if eta > settings.HF_WAIT_FOR_MODEL_BUDGET:
+            logger.info(f"[GeminiService] HF '{hf_model}' still loading (~{eta:.0f}s), skipping")
+            return None
+        if eta > 0:
+            hf_payload["options"] = {"wait_for_model": True}
+        if not scoreboard.allow(hf_model):
+            return None
+
+        logger.info(f"[GeminiService] Trying Hugging Face model '{hf_model}'...")
+        hf_resp = await client.post(
+            hf_url,
+            headers=hf_headers,
+            json=hf_payload,
+            timeout=15.0 + (settings.HF_WAIT_FOR_MODEL_BUDGET if eta > 0 else 0)
+        )
+        logger.info(f"[GeminiService] HF '{hf_model}' status: {hf_resp.status_code}")
+        if note_hf_response(hf_model, hf_resp) is not None:
+            observe_upstream("hf", hf_model, "loading", time.monotonic() - start)
+            return None
+        hf_resp.raise_for_status()
+        scoreboard.record(hf_model, ok=True, latency=time.monotonic() - start)
+        observe_upstream("hf", hf_model, "ok", time.monotonic() - start)
+
+        hf_result = hf_resp.json()
+        if isinstance(hf_result, dict) and "generated_text" in hf_result:
+            return hf_result["generated_text"]
+        if isinstance(hf_result, list) and hf_result and "generated_text" in hf_result[0]:
+            return hf_result[0]["generated_text"]
+
+        logger.warning(f"[GeminiService] Unexpected HF result from '{hf_model}': {hf_result}")
+
+    except Exception as hf_exc:
+        logger.error(f"[GeminiService] HF fallback error for '{hf_model}': {hf_exc}", exc_info=True)
+        scoreboard.record(hf_model, ok=False, latency=time.monotonic() - start)
+        observe_upstream("hf", hf_model, _failure_status(hf_exc), time.monotonic() - start)
+    return None
+
+
+def _hf_providers(client, full_prompt: str) -> list:
+    return [
+        (hf_model, lambda m=hf_model: call_hf_model(client, m, full_prompt))
+        for hf_model in HF_MODELS
+    ]
+
+
+async def _route(providers: list) -> Optional[str]:
+    # Providers with an open circuit are skipped instead of paying their timeout
+    healthy = [p for p in providers if scoreboard.available(p[0])]
+    if not healthy:
+        logger.warning("[GeminiService] All providers have open circuits.")
+        return None
+    return await race_providers(
+        healthy,
+        deadline=settings.LLM_DEADLINE_SECONDS,
+        hedge=settings.LLM_HEDGING_ENABLED,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        default_hedge_delay=settings.LLM_HEDGE_DEFAULT_DELAY,
+    )
 
-async def get_gemini_response(messages: list, user_id: str = None) -> str:
+
+async def get_gemini_response(messages: list, user_id: str = None, client=None) -> str:
+    """
+    Try Gemini API first, fallback to Hugging Face if needed. History is trimmed
+    to the configured token budget. Providers are raced through the hedged
+    router under one global deadline.
+    """
+    if not GEMINI_API_KEY:
+        logger.warning("[GeminiService] Gemini API key not configured.")
+        return "Gemini API key not configured."
+
+    client = client or get_http_client()
+    payload = build_payload(messages, user_id)
+    full_prompt = build_prompt(messages, user_id)
+
+    providers = [("gemini", lambda: call_gemini(client, payload))]
+    if HF_API_KEY:
+        providers += _hf_providers(client, full_prompt)
+
+    answer = await _route(providers)
+    if answer:
+        return answer
+    if not HF_API_KEY:
+        logger.warning("[GeminiService] Hugging Face API key not configured.")
+        return "Sorry, I couldn’t connect to Gemini or Hugging Face right now."
+    return "Sorry, all AI models failed. Please try again later."
+
+
+async def get_hf_fallback_response(client, full_prompt: str) -> str:
     """
-    Try Gemini API first, fallback to Hugging Face if needed. Accepts last 5 messages in memory.
+    Answer from the Hugging Face text-generation models via the hedged router.
+    """
+    if not HF_API_KEY:
+        logger.warning("[GeminiService] Hugging Face API key not configured.")
+        return "Sorry, I couldn’t connect to Gemini or Hugging Face right now."
+
+    answer = await _route(_hf_providers(client, full_prompt))
+    return answer or "Sorry, all AI models failed. Please try again later."
+
+
+def _extract_chunk_text(chunk_json: dict) -> str:
+    candidates = chunk_json.get("candidates", [])
+    if not candidates or "content" not in candidates[0]:
+        return ""
+    parts = candidates[0]["content"].get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+async def stream_gemini_response(messages: list, user_id: str = None, client=None):
+    """
+    Stream the reply from Gemini's streamGenerateContent (SSE) as text chunks.
+    If Gemini fails before the first chunk, yield the Hugging Face fallback reply instead.
     """
     full_prompt = build_prompt(messages, user_id)
+    client = client or get_http_client()
 
     if not GEMINI_API_KEY:
         logger.warning("[GeminiService] Gemini API key not configured.")
-        return "Gemini API key not configured."
+        yield "Gemini API key not configured."
+        return
+
+    payload = build_payload(messages, user_id)
+
+    if not scoreboard.allow("gemini"):
+        yield await get_hf_fallback_response(client, full_prompt)
+        return
 
-    payload = {
-        "contents": [
-            {"parts": [{"text": full_prompt}]}
-        ]
-    }
-
-    async with httpx.AsyncClient() as client:
-        # Try Gemini first
-        try:
-            logger.info(f"[GeminiService] Sending prompt to Gemini Flash...")
-            resp = await client.post(
-                f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-                json=payload,
-                timeout=15.0
-            )
-            logger.info(f"[GeminiService] Gemini status: {resp.status_code}")
+    sent_any = False
+    start = time.monotonic()
+    try:
+        logger.info(f"[GeminiService] Streaming prompt to Gemini Flash...")
+        async with client.stream(
+            "POST",
+            f"{GEMINI_STREAM_URL}?alt=sse&key={GEMINI_API_KEY}",
+            json=payload,
+            timeout=15.0
+        ) as resp:
+            logger.info(f"[GeminiService] Gemini stream status: {resp.status_code}")
             resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                text = _extract_chunk_text(json.loads(line[len("data:"):].strip()))
+                if text:
+                    if not sent_any:
+                        # Time to first chunk is what the user waits on
+                        scoreboard.record("gemini", ok=True, latency=time.monotonic() - start)
+                        observe_upstream("gemini-stream", GEMINI_MODEL, "ok", time.monotonic() - start)
+                    sent_any = True
+                    yield text
+        if sent_any:
+            return
+        # A 200 stream with no text is a failed call too, or it would slip past the breaker
+        logger.warning("[GeminiService] Gemini stream ended without any text.")
+        scoreboard.record("gemini", ok=False, latency=time.monotonic() - start)
+        observe_upstream("gemini-stream", GEMINI_MODEL, "model_error", time.monotonic() - start)
+    except Exception as gemini_exc:
+        logger.error(f"[GeminiService] Gemini stream error: {gemini_exc}", exc_info=True)
+        if not sent_any:
+            scoreboard.record("gemini", ok=False, latency=time.monotonic() - start)
+            observe_upstream("gemini-stream", GEMINI_MODEL, _failure_status(gemini_exc), time.monotonic() - start)
+        if sent_any:
+            # Part of the reply already reached the client, a fallback would repeat it
+            return
 
-            gemini_json = resp.json()
-            candidates = gemini_json.get("candidates", [])
-            if candidates and "content" in candidates[0]:
-                parts = candidates[0]["content"].get("parts", [])
-                if parts and "text" in parts[0]:
-                    return parts[0]["text"]
-
-            return "Hi! I’m MindMate. How are you feeling today?"
-
-        except Exception as gemini_exc:
-            logger.error(f"[GeminiService] Gemini error: {gemini_exc}", exc_info=True)
-
-        # Fallback to Hugging Face
-        if not HF_API_KEY:
-            logger.warning("[GeminiService] Hugging Face API key not configured.")
-            return "Sorry, I couldn’t connect to Gemini or Hugging Face right now."
-
-        for hf_model in HF_MODELS:
-            try:
-                hf_url = f"https://api-inference.huggingface.co/models/{hf_model}"
-                hf_headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-                hf_payload = {"inputs": full_prompt}
-
-                logger.info(f"[GeminiService] Trying Hugging Face model '{hf_model}'...")
-                hf_resp = await client.post(
-                    hf_url,
-                    headers=hf_headers,
-                    json=hf_payload,
-                    timeout=15.0
-                )
-                logger.info(f"[GeminiService] HF '{hf_model}' status: {hf_resp.status_code}")
-                hf_resp.raise_for_status()
-
-                hf_result = hf_resp.json()
-                if isinstance(hf_result, dict) and "generated_text" in hf_result:
-                    return hf_result["generated_text"]
-                if isinstance(hf_result, list) and hf_result and "generated_text" in hf_result[0]:
-                    return hf_result[0]["generated_text"]
-
-                logger.warning(f"[GeminiService] Unexpected HF result from '{hf_model}': {hf_result}")
-
-            except Exception as hf_exc:
-                logger.error(f"[GeminiService] HF fallback error for '{hf_model}': {hf_exc}", exc_info=True)
-                continue
-
-        return "Sorry, all AI models failed. Please try again later."
+    yield await get_hf_fallback_response(client, full_prompt)
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.circuit_breaker import scoreboard
+from app.core.metrics import call_status, observe_upstream
+
+logger = logging.getLogger(__name__)
+
+HF_INFERENCE_URL = settings.HF_INFERENCE_URL
+
+
+class ModelWarmth:
+    """
+    Load state of each HF model, learned from real calls and warm-up pings.
+    While a model loads, HF answers 503 {"error": ..., "estimated_time": s};
+    that is tracked here as "loading" rather than counted as a failure.
+    """
+
+    def __init__(self):
+        self._models: dict = {}
+
+    def _entry(self, model: str) -> dict:
+        return self._models.setdefault(model, {"state": "unknown", "ready_at": 0.0, "last_ok": None})
+
+    def mark_ready(self, model: str) -> None:
+        entry = self._entry(model)
+        entry["state"] = "warm"
+        entry["ready_at"] = 0.0
+        entry["last_ok"] = time.monotonic()
+
+    def mark_loading(self, model: str, estimated_time: float) -> None:
+        entry = self._entry(model)
+        entry["state"] = "loading"
+        entry["ready_at"] = time.monotonic() + estimated_time
+
+    def mark_failed(self, model: str) -> None:
+        self._entry(model)["state"] = "error"
+
+    def eta(self, model: str) -> float:
+        """Seconds until `model` is expected to be loaded; 0 when warm or unknown."""
+        entry = self._models.get(model)
+        if entry is None or entry["state"] != "loading":
+            return 0.0
+        return max(0.0, entry["ready_at"] - time.monotonic())
+
+    def idle_for(self, model: str) -> Optional[float]:
+        """Seconds since `model` last answered successfully (None if never)."""
+        entry = self._models.get(model)
+        if entry is None or entry["last_ok"] is None:
+            return None
+        return time.monotonic() - entry["last_ok"]
+
+    def snapshot(self, models: list = None) -> dict:
+        view = {}
+        for model in models if models is not None else list(self._models):
+            entry = self._models.get(model, {"state": "unknown", "last_ok": None})
+            idle = self.idle_for(model)
+            view[model] = {
+                "state": entry["state"],
+                "eta_s": round(self.eta(model), 1),
+                "last_ok_s_ago": round(idle, 1) if idle is not None else None,
+            }
+        return view
+
+
+model_warmth = ModelWarmth()
+
+
+def loading_eta(status_code: int, result) -> Optional[float]:
+    """estimated_time from a 503 "model is loading" body, else None."""
+    if status_code != 503 or not isinstance(result, dict):
+        return None
+    if "estimated_time" in result:
+        return float(result["estimated_time"])
+    return 20.0 if "loading" in str(result.get("error", "")).lower() else None
+
+
+def note_hf_response(model: str, response) -> Optional[float]:
+    """
+    Update `model`'s warm state from a raw HF response (for callers that don't
+    go through post_inference). Returns the loading ETA when it is loading.
+    """
+    if response.status_code < 400:
+        model_warmth.mark_ready(model)
+        return None
+    try:
+        result = response.json()
+    except ValueError:
+        result = None
+    eta = loading_eta(response.status_code, result)
+    if eta is None:
+        model_warmth.mark_failed(model)
+    else:
+        model_warmth.mark_loading(model, eta)
+    return eta
+
+
+async def _post(client, model: str, inputs, timeout: float, wait_for_model: bool):
+    payload = {"inputs": inputs}
+    if wait_for_model:
+        payload["options"] = {"wait_for_model": True}
+    headers = {"Authorization": f"Bearer {settings.HF_API_KEY}"}
+    response = await client.post(f"{HF_INFERENCE_URL}/{model}", json=payload, headers=headers, timeout=timeout)
+    return response, response.json()
+
+
+async def post_inference(client, model: str, inputs, timeout: float = 10.0, wait_budget: float = None):
+    """
+    POST inputs (a string or a list of strings) to the HF inference API.
+    Returns the decoded JSON body, or None when the call itself fails.
+
+    Cold models: if the model is known to be loading and will be ready within
+    `wait_budget` seconds (HF_WAIT_FOR_MODEL_BUDGET by default), the call asks
+    HF to wait_for_model; if it is further out, the loading error is returned
+    without spending a call. An unexpected 503 "loading" is retried once with
+    wait_for_model when its estimated_time fits the budget.
+    """
+    wait_budget = settings.HF_WAIT_FOR_MODEL_BUDGET if wait_budget is None else wait_budget
+    eta = model_warmth.eta(model)
+    if eta > wait_budget:
+        return {"error": f"Model {model} is currently loading", "estimated_time": round(eta, 1)}
+
+    wait = eta > 0
+    start = time.monotonic()
+    try:
+        response, result = await _post(client, model, inputs, timeout + (wait_budget if wait else 0), wait)
+        loading = loading_eta(response.status_code, result)
+        if loading is not None and not wait and loading <= wait_budget:
+            model_warmth.mark_loading(model, loading)
+            logger.info(f"[HFInference] Model {model} is loading (~{loading:.0f}s), waiting for it")
+            response, result = await _post(client, model, inputs, timeout + wait_budget, True)
+    except Exception as e:
+        logger.warning(f"[HFInference] Model {model} failed: {e}")
+        latency = time.monotonic() - start
+        scoreboard.record(model, ok=False, latency=latency)
+        observe_upstream("hf", model, call_status(exc=e), latency)
+        return None
+
+    latency = time.monotonic() - start
+    loading = loading_eta(response.status_code, result)
+    if loading is not None:
+        # Still loading: not a health failure, the model is just unavailable for now
+        model_warmth.mark_loading(model, loading)
+        observe_upstream("hf", model, "loading", latency)
+        return result
+
+    ok = response.status_code < 400 and not (isinstance(result, dict) and "error" in result)
+    if ok:
+        model_warmth.mark_ready(model)
+    else:
+        model_warmth.mark_failed(model)
+    scoreboard.record(model, ok=ok, latency=latency)
+    observe_upstream("hf", model, call_status(response, ok=ok), latency)
+    return result
+
+
+class ModelBatcher:
+    """
+    Collects concurrent texts for one model and sends them as a single
+    list-input request. A batch is flushed when it reaches max_batch items
+    or max_wait seconds after its first item, whichever comes first.
+    """
+
+    def __init__(self, model: str, max_batch: int, max_wait: float, timeout: float = 10.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: set = set()
+        self.batches_sent = 0
+        self.items_sent = 0
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._collect())
+
+    async def submit(self, client, text: str):
+        """Queue one text and wait for its share of the batched response."""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((client, text, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # Flush in the background so the next batch can start collecting
+                task = asyncio.create_task(self._flush(batch))
+                self._flushing.add(task)
+                task.add_done_callback(self._flushing.discard)
+                batch = []
+        finally:
+            _abandon(batch)
+
+    async def _flush(self, batch: list) -> None:
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        try:
+            await self._send(batch)
+        finally:
+            # Cancelled mid-call (shutdown): callers get the same None as a failed call
+            _abandon(batch)
+
+    async def _send(self, batch: list) -> None:
+        client = batch[0][0]
+        # Identical texts in one batch are sent once
+        texts = list(dict.fromkeys(text for _, text, _ in batch))
+        self.batches_sent += 1
+        self.items_sent += len(texts)
+
+        if len(texts) == 1:
+            result = await post_inference(client, self.model, texts[0], self.timeout)
+            by_text = {texts[0]: result}
+        else:
+            result = await post_inference(client, self.model, texts, self.timeout)
+            if isinstance(result, list) and len(result) == len(texts):
+                # Wrap each item so it has the same shape as a single-input response
+                by_text = {text: [item] for text, item in zip(texts, result)}
+            else:
+                # Error payloads (e.g. model loading) apply to every item
+                by_text = {text: result for text in texts}
+
+        for _, text, future in batch:
+            if not future.done():
+                future.set_result(by_text.get(text))
+
+    async def close(self) -> None:
+        """
+        Stop collecting and cancel in-flight flushes before the shared HTTP
+        client goes away. Every waiting submit() resolves to None.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        flushing = list(self._flushing)
+        for task in flushing:
+            task.cancel()
+        await asyncio.gather(*flushing, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                _abandon([self._queue.get_nowait()])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches_sent,
+            "items": self.items_sent,
+            "avg_batch_size": round(self.items_sent / self.batches_sent, 2) if self.batches_sent else 0.0,
+        }
+
+
+def _abandon(batch: list) -> None:
+    for _, _, future in batch:
+        if not future.done():
+            future.set_result(None)
+
+
+_batchers: dict[str, ModelBatcher] = {}
+
+
+def get_batcher(model: str) -> ModelBatcher:
+    batcher = _batchers.get(model)
+    if batcher is None:
+        batcher = ModelBatcher(
+            model,
+            max_batch=settings.HF_BATCH_MAX_SIZE,
+            max_wait=settings.HF_BATCH_MAX_WAIT_MS / 1000.0,
+        )
+        _batchers[model] = batcher
+    return batcher
+
+
+def batcher_stats() -> dict:
+    return {model: b.stats() for model, b in _batchers.items()}
+
+
+async def close_batchers() -> None:
+    for batcher in _batchers.values():
+        await batcher.close()
+    _batchers.clear()
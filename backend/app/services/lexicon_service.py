@@ -0,0 +1,167 @@
+import json
+import logging
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default term lists (English + Banglish + Bangla). Override with LEXICON_PATH,
+# a JSON file shaped like {"toxic": [...], "safe": [...]}.
+DEFAULT_TOXIC_TERMS = [
+    # English
+    "fuck", "fucking", "fucker", "motherfucker", "fuck you", "fuck off",
+    "bitch", "bastard", "asshole", "dickhead", "cunt", "slut", "whore",
+    "retard", "kill yourself", "kys", "go die",
+    # Banglish
+    "magi", "khanki", "khankir pola", "khankir chele", "chudi", "chod",
+    "choda", "chodna", "bokachoda", "boka choda", "madarchod", "madarchud",
+    "bainchod", "benchod", "haramjada", "haramzada", "haramjadi", "harami",
+    "shuorer bachcha", "shuorer baccha", "kuttar bachcha", "kuttar baccha",
+    "gandu", "tor maire", "tor mayre",
+    # Bangla
+    "মাগি", "খানকি", "চুদি", "হারামজাদা", "হারামি", "শুয়োরের বাচ্চা", "কুত্তার বাচ্চা",
+]
+
+DEFAULT_SAFE_TERMS = [
+    # English
+    "hi", "hello", "hey", "ok", "okay", "yes", "yeah", "thanks", "thank you",
+    "thank you so much", "good", "great", "nice", "awesome", "amazing",
+    "beautiful", "love", "love it", "love this", "well done", "great job",
+    "good job", "good luck", "best of luck", "congrats", "congratulations",
+    "take care", "stay strong", "you got this", "proud of you", "same",
+    "me too", "agreed", "happy", "so happy", "good morning", "good night",
+    "sending hugs", "hugs", "you are not alone", "i am here for you",
+    # Banglish
+    "dhonnobad", "dhonyobad", "dhanyabad", "valo", "bhalo", "onek valo",
+    "khub valo", "onek bhalo", "khub bhalo", "valo thakben", "valo theko",
+    "bhalo theko", "shuvo kamona", "subho kamona", "kemon acho", "kemon achen",
+    "ami valo achi", "ami bhalo achi", "amio", "ami o", "thik ache", "thik ase",
+    "alhamdulillah", "inshallah", "mashallah", "oshadharon", "darun",
+    # Bangla
+    "ধন্যবাদ", "ভালো", "অনেক ভালো", "শুভ কামনা", "ভালো থাকবেন", "আলহামদুলিল্লাহ",
+]
+
+TOXIC_SCORE = 1.0
+BENIGN_SCORE = 0.95
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every occurrence of
+    every term, regardless of how many terms are loaded.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: list[str] = []
+        self._goto: list[dict] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self.patterns))
+        self.patterns.append(pattern)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text: str):
+        """Yield (start, end, pattern) for every match, end exclusive."""
+        node = 0
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                pattern = patterns[idx]
+                yield i + 1 - len(pattern), i + 1, pattern
+
+
+def _is_boundary(text: str, i: int) -> bool:
+    return i <= 0 or i >= len(text) or not text[i].isalnum()
+
+
+class Lexicon:
+    """
+    Toxic and safe term lists compiled into one matcher.
+    Terms only count on whole-word boundaries.
+    """
+
+    def __init__(self, toxic_terms: Iterable[str], safe_terms: Iterable[str],
+                 normalize: Callable[[str], str] = str.lower, benign_max_tokens: int = 6):
+        self.toxic = {normalize(t) for t in toxic_terms if t and normalize(t)}
+        self.safe = {normalize(t) for t in safe_terms if t and normalize(t)} - self.toxic
+        self.benign_max_tokens = benign_max_tokens
+        self.matcher = AhoCorasick(sorted(self.toxic | self.safe))
+
+    def scan(self, text: str):
+        """Return (toxic_hits, covered) where covered marks chars inside safe terms."""
+        toxic_hits = []
+        covered = bytearray(len(text))
+        for start, end, term in self.matcher.finditer(text):
+            if not (_is_boundary(text, start - 1) and _is_boundary(text, end)):
+                continue
+            if term in self.toxic:
+                toxic_hits.append(term)
+            else:
+                covered[start:end] = b"\x01" * (end - start)
+        return toxic_hits, covered
+
+    def verdict(self, text: str):
+        """
+        Classify clear-cut cases locally:
+        - any toxic term -> ("toxic", TOXIC_SCORE)
+        - short text made only of safe terms -> ("not-toxic", BENIGN_SCORE)
+        - otherwise (None, 0.0), leave it to the remote ensemble
+        """
+        if not text:
+            return None, 0.0
+        toxic_hits, covered = self.scan(text)
+        if toxic_hits:
+            return "toxic", TOXIC_SCORE
+
+        if len(text.split()) > self.benign_max_tokens:
+            return None, 0.0
+        if all(covered[i] or not ch.isalnum() for i, ch in enumerate(text)):
+            return "not-toxic", BENIGN_SCORE
+        return None, 0.0
+
+
+def load_lexicon(path: Optional[str] = None, normalize: Callable[[str], str] = str.lower,
+                 benign_max_tokens: int = 6) -> Lexicon:
+    """Build the lexicon from the default lists, extended by an optional JSON file."""
+    toxic = list(DEFAULT_TOXIC_TERMS)
+    safe = list(DEFAULT_SAFE_TERMS)
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            toxic.extend(data.get("toxic", []))
+            safe.extend(data.get("safe", []))
+        except Exception as exc:
+            logger.error(f"[Lexicon] Could not load lexicon file '{path}': {exc}")
+    return Lexicon(toxic, safe, normalize=normalize, benign_max_tokens=benign_max_tokens)
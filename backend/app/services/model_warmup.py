@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.services.audio_service import encode_wav
+from app.services.gemini_service import HF_MODELS
+from app.services.hf_inference import model_warmth, note_hf_response, post_inference
+from app.services.moderation_service import SENTIMENT_MODELS, TOXICITY_MODELS
+from app.services.transcribe_service import API_URL as WHISPER_URL, HEADERS as WHISPER_HEADERS, WHISPER_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Half a second of silence is enough to make Whisper load
+_SILENCE_WAV = encode_wav(np.zeros(8000, dtype=np.float32), 16000)
+
+
+def warm_targets() -> list:
+    """Every HF model the service calls, in ping order: moderation first."""
+    models = list(dict.fromkeys(TOXICITY_MODELS + SENTIMENT_MODELS + HF_MODELS))
+    return models + [WHISPER_MODEL]
+
+
+class ModelWarmer:
+    """
+    Keeps the HF models we depend on loaded. Every `interval` seconds each
+    model that hasn't answered a real call within the interval gets a tiny
+    request with wait_for_model, so pings only spend quota on idle models
+    and a cold model is loaded before users hit it.
+    """
+
+    def __init__(self, interval: float, timeout: float, concurrency: int):
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.pings = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.error(f"[ModelWarmer] Warm-up round failed: {exc}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, client=None) -> None:
+        client = client or get_http_client()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stale = [
+            model for model in warm_targets()
+            if (idle := model_warmth.idle_for(model)) is None or idle >= self.interval
+        ]
+
+        async def ping(model: str):
+            async with semaphore:
+                await self.ping(client, model)
+
+        await asyncio.gather(*(ping(model) for model in stale))
+        self.rounds += 1
+        if stale:
+            logger.info(f"[ModelWarmer] Pinged {len(stale)} idle models")
+
+    async def ping(self, client, model: str) -> None:
+        self.pings += 1
+        if model == WHISPER_MODEL:
+            try:
+                response = await client.post(
+                    WHISPER_URL,
+                    headers={**WHISPER_HEADERS, "Content-Type": "audio/wav", "x-wait-for-model": "true"},
+                    content=_SILENCE_WAV,
+                    timeout=self.timeout
+                )
+                note_hf_response(model, response)
+            except Exception as exc:
+                model_warmth.mark_failed(model)
+                logger.warning(f"[ModelWarmer] Whisper ping failed: {exc}")
+            return
+        # post_inference records the warm state; wait_budget lets the ping wait out the load
+        await post_inference(client, model, "hello", timeout=self.timeout, wait_budget=self.timeout)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "rounds": self.rounds,
+            "pings": self.pings,
+            "models": model_warmth.snapshot(warm_targets()),
+        }
+
+
+model_warmer = ModelWarmer(
+    interval=settings.HF_WARMUP_INTERVAL,
+    timeout=settings.HF_WARMUP_TIMEOUT,
+    concurrency=settings.HF_WARMUP_CONCURRENCY,
+)
@@ -0,0 +1,43 @@
+import logging
+
+from app.core.config import settings
+from app.core.job_queue import JobQueue
+from app.services.moderation_service import moderate_text
+
+logger = logging.getLogger(__name__)
+
+
+async def run_moderation_job(payload: dict) -> dict:
+    """Moderate a queued post or comment; the result mirrors the synchronous route response."""
+    label, score = await moderate_text(payload["content"])
+    return {
+        "status": "rejected" if label == "toxic" else "accepted",
+        "model_label": label,
+        "confidence": score,
+    }
+
+
+moderation_queue = JobQueue(
+    "moderation",
+    handler=run_moderation_job,
+    redis_url=settings.REDIS_URL,
+    workers=settings.MODERATION_QUEUE_WORKERS,
+    visibility_timeout=settings.MODERATION_QUEUE_VISIBILITY_TIMEOUT,
+    max_attempts=settings.MODERATION_QUEUE_MAX_ATTEMPTS,
+    result_ttl=settings.MODERATION_QUEUE_RESULT_TTL,
+)
+
+
+def job_status(job: dict) -> dict:
+    """Public view of a moderation job for the status endpoint."""
+    view = {
+        "id": job["id"],
+        "kind": job["payload"].get("kind"),
+        "state": job["status"],
+        "attempts": job["attempts"],
+    }
+    if job["status"] == "done":
+        view.update(job["result"])
+    elif job["status"] == "failed":
+        view["error"] = job["error"]
+    return view
@@ -1,52 +1,56 @@
-import unicodedata
-import string
-import emoji
-import httpx
 import asyncio
+import logging
+from typing import Optional
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.cache import verdict_cache
+from app.core.circuit_breaker import scoreboard
+from app.core.metrics import observe_agreement, observe_verdict
+from app.core.rate_limit import upstream_governor
+from app.core.singleflight import SingleFlight
+from app.services.lexicon_service import load_lexicon
+from app.services.hf_inference import post_inference, get_batcher
+from app.services.text_features import TextFeatures, extract_features, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+TOXICITY_MODELS = [
+    "unitary/toxic-bert",
+    "Hate-speech-CNERG/bert-base-uncased-hate-speech",
+    "Hate-speech-CNERG/dehatebert-mono-english",
+    "cointegrated/rubert-toxic-pikabu"
+]
+
+SENTIMENT_MODELS = [
+    "distilroberta-base",
+    "cardiffnlp/twitter-roberta-base-sentiment",
+    "finiteautomata/bertweet-base-sentiment-analysis"
+]
 
 
 def preprocess(text: str) -> str:
-    text = unicodedata.normalize('NFKC', text)
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    return text.strip()
+    return normalize_text(text)
+
+
+# Concurrent identical analyses share one ensemble run
+toxicity_flights = SingleFlight("toxicity")
+sentiment_flights = SingleFlight("sentiment")
+
+
+LEXICON = load_lexicon(
+    settings.LEXICON_PATH,
+    normalize=preprocess,
+    benign_max_tokens=settings.LEXICON_BENIGN_MAX_TOKENS
+)
 
 
 def emoji_toxic(text: str):
-    toxic_emojis = {"💩", "🤬", "😡", "😠"}
-    found = emoji.emoji_list(text)
-    for item in found:
-        emj = item['emoji']
-        if emj in toxic_emojis:
-            return "toxic", 1.0
-    return None, 0.0
+    return extract_features(text).toxic_emoji or (None, 0.0)
 
 
 def emoji_sentiment(text: str):
-    emoji_map = {
-        "😊": ("positive", 1.0),
-        "😀": ("positive", 1.0),
-        "😃": ("positive", 1.0),
-        "😄": ("positive", 1.0),
-        "😍": ("positive", 1.0),
-        "🥰": ("positive", 1.0),
-        "😂": ("positive", 0.8),
-        "😭": ("negative", 0.8),
-        "😢": ("negative", 0.8),
-        "😞": ("negative", 1.0),
-        "😡": ("negative", 1.0),
-        "😠": ("negative", 1.0),
-        "😔": ("negative", 0.8),
-        "😐": ("neutral", 0.7),
-        "😶": ("neutral", 0.7)
-    }
-    found = emoji.emoji_list(text)
-    for item in found:
-        emj = item['emoji']
-        if emj in emoji_map:
-            return emoji_map[emj]
-    return None, 0.0
+    return extract_features(text).sentiment_emoji or (None, 0.0)
 
 
 def map_sentiment_label(label: str):
@@ -65,102 +69,261 @@ def map_sentiment_label(label: str):
 
 
 async def query_model(client, model: str, text: str):
-    url = f"https://api-inference.huggingface.co/models/{model}"
-    headers = {"Authorization": f"Bearer {settings.HF_API_KEY}"}
-    try:
-        response = await client.post(url, json={"inputs": text}, headers=headers, timeout=10.0)
-        return response.json()
-    except Exception as e:
-        print(f"[WARN] Model {model} failed: {e}")
+    # A half-open model takes one probe at a time; other callers skip it meanwhile
+    if not scoreboard.allow(model):
         return None
+    # Concurrent callers share one list-input request per model when batching is on
+    if settings.HF_BATCHING_ENABLED:
+        return await get_batcher(model).submit(client, text)
+    return await post_inference(client, model, text, timeout=10.0)
 
 
-async def moderate_text(text: str):
-    clean_text = preprocess(text)
+def top_prediction(result):
+    """Return the top {label, score} dict from an HF classification response, if any."""
+    if not result:
+        return None
+    first = result[0] if isinstance(result, list) else None
+    if isinstance(first, list) and first:
+        first = first[0]
+    return first if isinstance(first, dict) else None
 
-    # Emoji check first
-    emoji_label, emoji_score = emoji_toxic(clean_text)
-    if emoji_label:
-        return emoji_label, emoji_score
 
-    models = [
-        "unitary/toxic-bert",
-        "Hate-speech-CNERG/bert-base-uncased-hate-speech",
-        "Hate-speech-CNERG/dehatebert-mono-english",
-        "cointegrated/rubert-toxic-pikabu"
-    ]
+def toxicity_vote(result):
+    first = top_prediction(result)
+    if first is None:
+        return None
+    label = first.get("label", "not-toxic")
+    score = first.get("score", 0)
+    threshold = 0.7
+    if label.lower() == "toxic" and score >= threshold:
+        return "toxic", score
+    return "not-toxic", score
+
+
+def outcome_decided(label_weights: dict, pending: int) -> bool:
+    """
+    True when the remaining models can no longer change the winning label.
+    Each pending model adds at most 1.0 to a single label.
+    """
+    ranked = sorted(label_weights.values(), reverse=True)
+    lead = ranked[0] - (ranked[1] if len(ranked) > 1 else 0.0)
+    return lead > pending
 
+
+async def collect_toxicity_votes(client, models: list, text: str, quorum: bool, budget: float):
+    """
+    Run the toxicity models concurrently and tally their votes.
+    With quorum on, stop as soon as the weighted outcome is settled; either way
+    stop at the latency budget. Unfinished model calls are cancelled.
+    Returns (label_weights, votes as {model: label}, skipped models).
+    """
     label_weights = {"toxic": 0.0, "not-toxic": 0.0}
-    success_count = 0
+    votes = {}
 
-    async with httpx.AsyncClient() as client:
-        results = await asyncio.gather(
-            *[query_model(client, m, clean_text) for m in models]
-        )
+    tasks = {asyncio.create_task(query_model(client, m, text)): m for m in models}
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                vote = toxicity_vote(task.result())
+                if vote:
+                    label, score = vote
+                    label_weights[label] += score
+                    votes[tasks[task]] = label
+            if quorum and votes and outcome_decided(label_weights, len(pending)):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
 
-    for result in results:
-        if not result:
-            continue
-        first = result[0] if isinstance(result, list) else None
-        if isinstance(first, list) and first:
-            first = first[0]
-        if isinstance(first, dict):
-            label = first.get("label", "not-toxic")
-            score = first.get("score", 0)
-            threshold = 0.7
-            if label.lower() == "toxic" and score >= threshold:
-                label_weights["toxic"] += score
-            else:
-                label_weights["not-toxic"] += score
-            success_count += 1
+    skipped = [tasks[t] for t in pending]
+    return label_weights, votes, skipped
+
+
+async def moderate_text_detailed(text: str, client=None, features: Optional[TextFeatures] = None,
+                                 lexicon_blocks: bool = True) -> dict:
+    """
+    Moderate text and report how the verdict was reached:
+    label, score, source (emoji/lexicon/cache/ensemble) and the models that contributed.
+    Pass `features` when the caller already extracted them for this text.
+    With lexicon_blocks=False a lexicon hit only sends the text on to the
+    ensemble, for chat, where users may be quoting what was said to them.
+    """
+    verdict = await _toxicity_verdict(text, client, features, lexicon_blocks)
+    observe_verdict("toxicity", verdict["source"], verdict["label"])
+    return verdict
 
+
+async def _toxicity_verdict(text: str, client, features: Optional[TextFeatures], lexicon_blocks: bool = True) -> dict:
+    features = features or extract_features(text)
+    clean_text = features.normalized
+
+    # Emoji check first
+    if features.toxic_emoji:
+        emoji_label, emoji_score = features.toxic_emoji
+        return {"label": emoji_label, "score": emoji_score, "source": "emoji", "models": []}
+
+    # Local lexicon settles clearly toxic / clearly benign texts without a network call
+    if settings.LEXICON_PREFILTER_ENABLED:
+        lexicon_label, lexicon_score = LEXICON.verdict(clean_text)
+        # Without hard blocks a toxic hit is left for the ensemble to judge in context
+        if lexicon_label and (lexicon_blocks or lexicon_label != "toxic"):
+            return {"label": lexicon_label, "score": lexicon_score, "source": "lexicon", "models": []}
+
+    models = TOXICITY_MODELS
+
+    # Cached verdict for the same normalized text and model set
+    cache_key = verdict_cache.make_key("toxicity", models, clean_text)
+    if settings.VERDICT_CACHE_ENABLED:
+        cached = await verdict_cache.get(cache_key)
+        if cached:
+            return {"label": cached[0], "score": cached[1], "source": "cache", "models": []}
+
+    # Identical texts in flight at the same time share one ensemble run
+    client = client or get_http_client()
+    return await toxicity_flights.do(cache_key, lambda: _toxicity_ensemble(client, models, clean_text, cache_key))
+
+
+async def _toxicity_ensemble(client, models: list, clean_text: str, cache_key: str) -> dict:
+    # One HF slot per ensemble run; waits or raises UpstreamBusyError at capacity
+    async with upstream_governor.slot("hf"):
+        label_weights, votes, skipped = await collect_toxicity_votes(
+            client,
+            scoreboard.healthy(models),
+            clean_text,
+            quorum=settings.MODERATION_QUORUM,
+            budget=settings.MODERATION_BUDGET_SECONDS
+        )
+    contributors = list(votes)
+    if skipped:
+        logger.info(f"[Moderation] Verdict from {contributors}, cancelled {skipped}")
+
+    success_count = len(contributors)
     if success_count == 0:
-        return "not-toxic", 0.0
+        return {"label": "not-toxic", "score": 0.0, "source": "ensemble", "models": []}
 
     final_label = max(label_weights, key=label_weights.get)
     final_score = label_weights[final_label] / success_count
-    return final_label, final_score
+    observe_agreement("toxicity", votes, final_label)
+    # The cache key stands for every model; a quorum, budget or breaker-thinned vote isn't cached
+    if settings.VERDICT_CACHE_ENABLED and success_count == len(models):
+        await verdict_cache.set(cache_key, (final_label, final_score))
+    return {"label": final_label, "score": final_score, "source": "ensemble", "models": contributors}
+
+
+async def moderate_text(text: str, client=None, features: Optional[TextFeatures] = None,
+                        lexicon_blocks: bool = True):
+    verdict = await moderate_text_detailed(text, client, features, lexicon_blocks)
+    return verdict["label"], verdict["score"]
 
 
-async def ensemble_mood(text: str):
-    clean_text = preprocess(text)
+async def moderate_batch(texts: list, concurrency: int = None, client=None):
+    """
+    Moderate many texts, yielding (index, verdict) in input order.
+    Texts that normalize to the same string share one moderation run, at most
+    `concurrency` runs are in flight, and runs are only started a bounded
+    distance ahead of the output so large batches don't spawn a task each.
+    Feature extraction happens inside each run, so the event loop never does
+    it for the whole batch at once.
+    A failed run yields {"error": ...} for its texts instead of raising.
+    """
+    concurrency = concurrency or settings.MODERATION_BATCH_CONCURRENCY
+    client = client or get_http_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    keys = []  # normalized texts, filled in as the lookahead window advances
+    runs = {}
+    lookahead = concurrency * 4
+
+    async def run(text: str) -> dict:
+        async with semaphore:
+            return await moderate_text_detailed(text, client, extract_features(text))
+
+    try:
+        for i in range(len(texts)):
+            while len(keys) < min(i + lookahead, len(texts)):
+                text = texts[len(keys)]
+                key = normalize_text(text)
+                keys.append(key)
+                if key and key not in runs:
+                    runs[key] = asyncio.create_task(run(text))
+            key = keys[i]
+            if not key:
+                yield i, {"error": "Content cannot be empty."}
+                continue
+            try:
+                verdict = await runs[key]
+            except Exception as exc:
+                logger.error(f"[Moderation] Batch item {i} failed: {exc}")
+                verdict = {"error": str(exc)}
+            yield i, verdict
+    finally:
+        for task in runs.values():
+            task.cancel()
+
+
+async def ensemble_mood(text: str, client=None, features: Optional[TextFeatures] = None):
+    features = features or extract_features(text)
+    clean_text = features.normalized
 
     # Emoji check first
-    emoji_label, emoji_score = emoji_sentiment(clean_text)
-    if emoji_label:
-        return emoji_label, emoji_score
+    if features.sentiment_emoji:
+        observe_verdict("sentiment", "emoji", features.sentiment_emoji[0])
+        return features.sentiment_emoji
+
+    models = SENTIMENT_MODELS
+
+    # Cached verdict for the same normalized text and model set
+    cache_key = verdict_cache.make_key("sentiment", models, clean_text)
+    if settings.VERDICT_CACHE_ENABLED:
+        cached = await verdict_cache.get(cache_key)
+        if cached:
+            observe_verdict("sentiment", "cache", cached[0])
+            return cached
+
+    client = client or get_http_client()
+    label, score = await sentiment_flights.do(cache_key, lambda: _sentiment_ensemble(client, models, clean_text, cache_key))
+    observe_verdict("sentiment", "ensemble", label)
+    return label, score
 
-    models = [
-        "distilroberta-base",
-        "cardiffnlp/twitter-roberta-base-sentiment",
-        "finiteautomata/bertweet-base-sentiment-analysis"
-    ]
 
+async def _sentiment_ensemble(client, models: list, clean_text: str, cache_key: str):
     label_weights = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
     success_count = 0
+    votes = {}
 
-    async with httpx.AsyncClient() as client:
+    healthy = scoreboard.healthy(models)
+    async with upstream_governor.slot("hf"):
         results = await asyncio.gather(
-            *[query_model(client, m, clean_text) for m in models]
+            *[query_model(client, m, clean_text) for m in healthy]
         )
 
-    for result in results:
-        if not result:
+    for model, result in zip(healthy, results):
+        first = top_prediction(result)
+        if first is None:
             continue
-        first = result[0] if isinstance(result, list) else None
-        if isinstance(first, list) and first:
-            first = first[0]
-        if isinstance(first, dict):
-            raw_label = first.get("label", "neutral")
-            label = map_sentiment_label(raw_label)
-            score = first.get("score", 0)
-            if label in label_weights:
-                label_weights[label] += score
-            success_count += 1
+        raw_label = first.get("label", "neutral")
+        label = map_sentiment_label(raw_label)
+        score = first.get("score", 0)
+        if label in label_weights:
+            label_weights[label] += score
+        votes[model] = label
+        success_count += 1
 
     if success_count == 0:
         return "neutral", 0.0
 
     final_label = max(label_weights, key=label_weights.get)
     final_score = label_weights[final_label] / success_count
+    observe_agreement("sentiment", votes, final_label)
+    # Only a verdict from every model may answer later lookups for the full model set
+    if settings.VERDICT_CACHE_ENABLED and success_count == len(models):
+        await verdict_cache.set(cache_key, (final_label, final_score))
     return final_label, final_score
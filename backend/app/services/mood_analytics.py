@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.db import close_db, get_session_factory, init_db
+from app.models.models import MoodDailyRollup
+from app.services.mood_service import local_today
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("negative", "neutral", "positive")
+LABEL_INDEX = {label: i for i, label in enumerate(LABELS)}
+# Valence per label, used for daily mood scores in [-1, 1]
+VALENCE = np.array([-1.0, 0.0, 1.0])
+
+# Users per array block in batch mode, bounds memory at block * days * labels
+BATCH_BLOCK_USERS = 2000
+
+
+class MoodSeries:
+    """
+    Dense daily mood series for a set of users over [start, start + days),
+    days >= 1. counts and confidence_sums are shaped (users, days, labels).
+    """
+
+    def __init__(self, user_ids: list, start: date, days: int):
+        self.user_ids = list(user_ids)
+        self.start = start
+        self.days = days
+        shape = (len(self.user_ids), days, len(LABELS))
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.confidence_sums = np.zeros(shape, dtype=np.float64)
+
+    @property
+    def dates(self) -> list:
+        return [(self.start + timedelta(days=i)).isoformat() for i in range(self.days)]
+
+    def add_rollups(self, rollups) -> None:
+        """Scatter rollup rows into the arrays in one vectorized pass."""
+        if not rollups:
+            return
+        user_pos = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        rows = np.array([user_pos[r.user_id] for r in rollups], dtype=np.int64)
+        cols = np.array([(r.day - self.start).days for r in rollups], dtype=np.int64)
+        labels = np.array([LABEL_INDEX.get(r.mood_label, LABEL_INDEX["neutral"]) for r in rollups], dtype=np.int64)
+        np.add.at(self.counts, (rows, cols, labels), [r.count for r in rollups])
+        np.add.at(self.confidence_sums, (rows, cols, labels), [r.confidence_sum for r in rollups])
+
+
+async def load_series(user_ids: list, days: int, end: Optional[date] = None) -> MoodSeries:
+    """Load the daily rollups for user_ids over the last `days` days ending at `end` (today in MOOD_TIMEZONE)."""
+    end = end or local_today()
+    start = end - timedelta(days=days - 1)
+    series = MoodSeries(user_ids, start, days)
+    if not user_ids:
+        return series
+    async with get_session_factory()() as session:
+        result = await session.execute(
+            select(MoodDailyRollup).where(
+                MoodDailyRollup.user_id.in_(series.user_ids),
+                MoodDailyRollup.day >= start,
+                MoodDailyRollup.day <= end,
+            )
+        )
+        series.add_rollups(result.scalars().all())
+    return series
+
+
+def rolling_nanmean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` days along the last axis, skipping NaN days."""
+    present = ~np.isnan(values)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    sums = np.cumsum(np.pad(np.where(present, values, 0.0), pad), axis=-1)
+    seen = np.cumsum(np.pad(present.astype(np.int64), pad), axis=-1)
+    end = np.arange(1, values.shape[-1] + 1)
+    start = np.maximum(0, end - window)
+    window_sums = sums[..., end] - sums[..., start]
+    window_seen = seen[..., end] - seen[..., start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_seen > 0, window_sums / np.maximum(window_seen, 1), np.nan)
+
+
+def run_lengths(flags: np.ndarray) -> np.ndarray:
+    """Length of the run of True values ending at each position along the last axis."""
+    running = np.cumsum(flags, axis=-1)
+    resets = np.maximum.accumulate(np.where(flags, 0, running), axis=-1)
+    return running - resets
+
+
+def _nanmean(values: np.ndarray, axis: int) -> np.ndarray:
+    present = ~np.isnan(values)
+    total = np.where(present, values, 0.0).sum(axis=axis)
+    seen = present.sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(seen > 0, total / np.maximum(seen, 1), np.nan)
+
+
+def compute_stats(series: MoodSeries, window: int = 7) -> dict:
+    """
+    Vectorized stats for every user in the series at once. Every value is an
+    array with the user axis first.
+    """
+    counts = series.counts
+    per_day = counts.sum(axis=2)                                   # (users, days)
+    logged = per_day > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valence = np.where(logged, (counts @ VALENCE) / np.maximum(per_day, 1), np.nan)
+
+    totals = counts.sum(axis=(1, 2))                               # (users,)
+    label_counts = counts.sum(axis=1)                              # (users, labels)
+    confidence_totals = series.confidence_sums.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distribution = np.where(totals[:, None] > 0, label_counts / np.maximum(totals[:, None], 1), 0.0)
+        avg_confidence = np.where(label_counts > 0, confidence_totals / np.maximum(label_counts, 1), 0.0)
+
+    logging_runs = run_lengths(logged)
+    positive_runs = run_lengths(valence > 0)
+
+    # Spread of daily valence across logged days
+    mean_valence = _nanmean(valence, axis=1)
+    deviation = np.where(logged, valence - mean_valence[:, None], 0.0)
+    logged_days = logged.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volatility = np.where(logged_days > 1, np.sqrt((deviation ** 2).sum(axis=1) / np.maximum(logged_days, 1)), 0.0)
+
+    # Last 7 days vs the 7 before
+    this_week = valence[:, -7:]
+    last_week = valence[:, -14:-7]
+    wow_valence = _nanmean(this_week, axis=1) - _nanmean(last_week, axis=1)
+    wow_entries = per_day[:, -7:].sum(axis=1) - per_day[:, -14:-7].sum(axis=1)
+
+    return {
+        "entries": totals,
+        "days_logged": logged_days,
+        "daily_entries": per_day,
+        "daily_valence": valence,
+        "rolling_valence": rolling_nanmean(valence, window),
+        "mean_valence": mean_valence,
+        "label_counts": label_counts,
+        "label_distribution": distribution,
+        "label_avg_confidence": avg_confidence,
+        "current_streak": logging_runs[:, -1],
+        "longest_streak": logging_runs.max(axis=1),
+        "longest_positive_streak": positive_runs.max(axis=1),
+        "volatility": volatility,
+        "wow_valence_delta": wow_valence,
+        "wow_entries_delta": wow_entries,
+    }
+
+
+def _num(value, digits: int = 4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def user_summary(stats: dict, i: int) -> dict:
+    """Scalar stats for user row i as plain JSON-friendly values."""
+    return {
+        "entries": int(stats["entries"][i]),
+        "days_logged": int(stats["days_logged"][i]),
+        "mean_valence": _num(stats["mean_valence"][i]),
+        "volatility": _num(stats["volatility"][i]),
+        "current_streak": int(stats["current_streak"][i]),
+        "longest_streak": int(stats["longest_streak"][i]),
+        "longest_positive_streak": int(stats["longest_positive_streak"][i]),
+        "week_over_week": {
+            "valence_delta": _num(stats["wow_valence_delta"][i]),
+            "entries_delta": int(stats["wow_entries_delta"][i]),
+        },
+        "labels": {
+            label: {
+                "count": int(stats["label_counts"][i, j]),
+                "share": _num(stats["label_distribution"][i, j]),
+                "avg_confidence": _num(stats["label_avg_confidence"][i, j]),
+            }
+            for j, label in enumerate(LABELS)
+        },
+    }
+
+
+async def get_user_stats(user_id: str, days: int = 30, window: int = 7) -> dict:
+    """Stats for one user, including the daily series for the trend graph."""
+    series = await load_series([user_id], days)
+    stats = compute_stats(series, window)
+    summary = user_summary(stats, 0)
+    summary["series"] = {
+        "dates": series.dates,
+        "entries": [int(v) for v in stats["daily_entries"][0]],
+        "valence": [_num(v) for v in stats["daily_valence"][0]],
+        "rolling_valence": [_num(v) for v in stats["rolling_valence"][0]],
+    }
+    summary["window"] = window
+    return summary
+
+
+async def active_user_ids(days: int, end: Optional[date] = None) -> list:
+    end = end or local_today()
+    start = end - timedelta(days=days - 1)
+    async with get_session_factory()() as session:
+        result = await session.execute(
+            select(MoodDailyRollup.user_id).where(MoodDailyRollup.day >= start).distinct()
+        )
+        return sorted(result.scalars().all())
+
+
+async def compute_cohort_stats(user_ids: Optional[list] = None, days: int = 30, window: int = 7,
+                               block: int = BATCH_BLOCK_USERS):
+    """
+    Batch mode: yield (user_id, summary) for every user, by default everyone
+    active in the period. Users are processed in blocks of `block`, one query
+    and one vectorized pass per block.
+    """
+    if user_ids is None:
+        user_ids = await active_user_ids(days)
+    for offset in range(0, len(user_ids), block):
+        chunk = user_ids[offset:offset + block]
+        series = await load_series(chunk, days)
+        stats = compute_stats(series, window)
+        for i, user_id in enumerate(chunk):
+            yield user_id, user_summary(stats, i)
+        logger.info(f"[MoodAnalytics] Computed stats for {offset + len(chunk)}/{len(user_ids)} users")
+
+
+async def _main(days: int, window: int) -> None:
+    await init_db()
+    try:
+        async for user_id, summary in compute_cohort_stats(days=days, window=window):
+            sys.stdout.write(json.dumps({"user_id": user_id, **summary}) + "\n")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    # Nightly job: python -m app.services.mood_analytics --days 90 > stats.jsonl
+    parser = argparse.ArgumentParser(description="Recompute mood stats for all active users.")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--window", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args.days, args.window))
@@ -1,24 +1,249 @@
-from app.services.moderation_service import analyze_mood
-from app.db import get_session
-from backend.app.models.models import MoodEntry
-from fastapi import Depends
+import asyncio
+import base64
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
 
-async def create_mood_entry(user_id, mood_text, session=Depends(get_session)):
-    label, confidence = await analyze_mood(mood_text)
+from sqlalchemy import and_, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.db import get_session_factory
+from app.models.models import MoodDailyRollup, MoodEntry
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+_STOP = object()
+
+# Rollup days follow the users' calendar, so a day doesn't split mid-morning
+ROLLUP_TZ = ZoneInfo(settings.MOOD_TIMEZONE)
+
+
+def rollup_day(moment: datetime) -> date:
+    """Calendar day of `moment` in MOOD_TIMEZONE (naive datetimes are UTC)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(ROLLUP_TZ).date()
+
+
+def local_today() -> date:
+    return datetime.now(ROLLUP_TZ).date()
+
+
+class MoodWriteQueue:
+    """
+    Write-behind buffer for mood inserts. Entries get their ID up front, the
+    request returns immediately, and a background task commits them in
+    batches of up to max_batch or every flush_interval seconds.
+    """
+
+    def __init__(self, max_batch: int, flush_interval: float, max_retries: int = 3):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, entry: MoodEntry) -> None:
+        self._queue.put_nowait(entry)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                if batch[-1] is _STOP:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                stopping = True
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: list) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await insert_mood_entries(batch)
+                self.written += len(batch)
+                return
+            except Exception as exc:
+                logger.error(f"[MoodWriteQueue] Batch of {len(batch)} failed (attempt {attempt}): {exc}")
+                await asyncio.sleep(0.5 * attempt)
+        self.failed += len(batch)
+
+    async def stop(self) -> None:
+        """Flush whatever is still queued, then stop the background task."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            # Entries queued before the sentinel are written first
+            self._queue.put_nowait(_STOP)
+            await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {"queued": self.depth(), "written": self.written, "failed": self.failed}
+
+
+mood_write_queue = MoodWriteQueue(
+    max_batch=settings.MOOD_WRITE_BATCH_SIZE,
+    flush_interval=settings.MOOD_WRITE_FLUSH_MS / 1000.0,
+)
+
+
+def _aggregate(entries: list) -> dict:
+    """
+    Collapse entries into {(user, day, label): (count, confidence_sum)}.
+    Anonymous entries are left out: pooling them would let any anonymous
+    caller read everyone else's anonymous history.
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for entry in entries:
+        if not entry.user_id:
+            continue
+        key = (entry.user_id, rollup_day(entry.created_at), entry.mood_label)
+        totals[key][0] += 1
+        totals[key][1] += entry.confidence
+    return totals
+
+
+async def _upsert_rollups(session, entries: list) -> None:
+    """Add entries to the daily rollups with an INSERT ... ON CONFLICT increment."""
+    dialect = session.bind.dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    rows = [
+        {"user_id": user, "day": day, "mood_label": label, "count": count, "confidence_sum": conf}
+        for (user, day, label), (count, conf) in _aggregate(entries).items()
+    ]
+    if not rows:
+        return
+    stmt = insert(MoodDailyRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "mood_label"],
+        set_={
+            "count": MoodDailyRollup.count + stmt.excluded.count,
+            "confidence_sum": MoodDailyRollup.confidence_sum + stmt.excluded.confidence_sum,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def insert_mood_entries(entries: list) -> None:
+    """Insert mood entries and bump their daily rollups in one transaction."""
+    async with get_session_factory()() as session:
+        session.add_all(entries)
+        await session.flush()
+        await _upsert_rollups(session, entries)
+        await session.commit()
+
+
+async def store_mood_entry(user_id: Optional[str], mood_text: str, label: str, confidence: float) -> MoodEntry:
+    """
+    Persist an analyzed mood entry. With write-behind on, the entry is queued
+    and returned right away; otherwise it is committed before returning.
+    """
     entry = MoodEntry(user_id=user_id, mood_text=mood_text, mood_label=label, confidence=confidence)
-    session.add(entry)
-    session.commit()
-    session.refresh(entry)
+    if mood_write_queue.running:
+        mood_write_queue.put(entry)
+    else:
+        await insert_mood_entries([entry])
     return entry
 
-async def get_mood_history(user_id, period="week", session=Depends(get_session)):
-    from datetime import datetime, timedelta
-    now = datetime.utcnow()
-    if period == "week":
-        start = now - timedelta(days=7)
-    elif period == "month":
-        start = now - timedelta(days=30)
-    else:
-        start = now - timedelta(days=7)
-    entries = session.query(MoodEntry).filter(MoodEntry.user_id==user_id, MoodEntry.created_at>=start).all()
-    return entries
+
+async def get_mood_history(user_id: str, period: str = "week") -> list:
+    """
+    Per-day mood counts and average confidence per label, read from the
+    daily rollups so the cost scales with days in the period, not entries.
+    Anonymous entries have no history, so an empty user_id gets [].
+    """
+    if not user_id:
+        return []
+    start = local_today() - timedelta(days=PERIOD_DAYS.get(period, 7) - 1)
+    async with get_session_factory()() as session:
+        result = await session.execute(
+            select(MoodDailyRollup)
+            .where(MoodDailyRollup.user_id == user_id, MoodDailyRollup.day >= start)
+            .order_by(MoodDailyRollup.day)
+        )
+        rollups = result.scalars().all()
+
+    days = {}
+    for row in rollups:
+        day = days.setdefault(row.day, {"date": row.day.isoformat(), "total": 0, "labels": {}})
+        day["total"] += row.count
+        day["labels"][row.mood_label] = {
+            "count": row.count,
+            "avg_confidence": round(row.confidence_sum / row.count, 4) if row.count else 0.0,
+        }
+    return list(days.values())
+
+
+def encode_cursor(entry: MoodEntry) -> str:
+    raw = f"{entry.created_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        created, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created), entry_id
+    except Exception as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+async def list_mood_entries(user_id: str, limit: int = 50, cursor: Optional[str] = None) -> tuple[list, Optional[str]]:
+    """
+    Raw entries newest first, keyset-paginated on (created_at, id) so each
+    page is an index range scan regardless of depth.
+    Returns (entries, next_cursor); next_cursor is None on the last page.
+    Anonymous entries are never listed, so an empty user_id gets no entries.
+    """
+    if not user_id:
+        return [], None
+    query = select(MoodEntry).where(MoodEntry.user_id == user_id)
+    if cursor:
+        created, entry_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                MoodEntry.created_at < created,
+                and_(MoodEntry.created_at == created, MoodEntry.id < entry_id),
+            )
+        )
+    query = query.order_by(MoodEntry.created_at.desc(), MoodEntry.id.desc()).limit(limit + 1)
+
+    async with get_session_factory()() as session:
+        entries = list((await session.execute(query)).scalars().all())
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1])
+    return entries, next_cursor
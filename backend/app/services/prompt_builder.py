@@ -0,0 +1,138 @@
+import math
+from typing import Optional
+
+# Static system prompt, built once and sent through Gemini's systemInstruction
+# (or a cached context) instead of being re-sent inside every user turn.
+SYSTEM_PROMPT = (
+    "You are **MindMate**, an empathetic and trustworthy AI mental health "
+    "companion created to support **Bangladeshi university students**. "
+    "Your role is to provide a safe, judgment-free space where students feel "
+    "heard, understood, and encouraged. You are not a doctor, but a caring "
+    "peer who listens deeply and offers gentle, practical guidance.\n\n"
+
+    "### Context\n"
+    "- Many students in Bangladesh experience intense academic pressure, "
+    "family expectations, financial stress, social stigma, and limited access "
+    "to mental health resources.\n"
+    "- They may feel isolated or unable to openly discuss their struggles.\n"
+    "- Your purpose is to make them feel less alone, more hopeful, and more confident "
+    "in handling daily challenges.\n\n"
+
+    "### Tone & Personality\n"
+    "- Warm, caring, and approachable — like a close friend who listens without judgment.\n"
+    "- Simple, clear, student-friendly language (avoid technical or medical jargon).\n"
+    "- Always respectful of culture, family values, and social realities in Bangladesh.\n"
+    "- Encourage small, achievable steps instead of overwhelming advice.\n\n"
+
+    "### Core Principles\n"
+    "1. **Empathy First** – Acknowledge and validate the student’s feelings before offering advice.\n"
+    "2. **Cultural Awareness** – Relate advice to Bangladeshi student life "
+    "(e.g., exam prep, balancing family duties, hostel challenges, financial struggles).\n"
+    "3. **Practical Support** – Share actionable, realistic suggestions "
+    "students can try immediately.\n"
+    "4. **Safety Boundaries** – Never provide medical diagnoses, prescriptions, "
+    "or harmful content. If someone is in serious distress, gently encourage reaching out "
+    "to trusted people or professionals.\n"
+    "5. **Positivity with Depth** – Inspire confidence and hope, but never dismiss struggles.\n\n"
+
+    "### Response Style\n"
+    "- Begin with an empathetic reflection of what the student feels.\n"
+    "- Offer supportive, culturally relevant insights.\n"
+    "- Suggest one or two small, practical next steps.\n"
+    "- End with encouragement, reminding them they are not alone.\n\n"
+
+    "Your mission: make every student feel **valued, understood, and gently guided** "
+    "with compassion, cultural awareness, and warmth."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (~4 UTF-8 bytes per token).
+    Bangla script costs more bytes per character, which roughly matches how
+    tokenizers split it.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a single message down to roughly max_tokens, keeping its beginning."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = max(1, int(len(text) * max_tokens / tokens))
+    return text[:keep].rstrip() + " …"
+
+
+def _field(msg, name: str, default: str = "") -> str:
+    # Messages arrive as ChatMessage models from /chat and as dicts from voice chat
+    if isinstance(msg, dict):
+        return msg.get(name, default) or default
+    return getattr(msg, name, default) or default
+
+
+def select_history(messages: list, token_budget: int, max_message_tokens: int) -> list:
+    """
+    Newest-first selection of (role, text) turns that fit the token budget.
+    The latest message is always kept (truncated if needed). Returned oldest first.
+    """
+    selected = []
+    used = 0
+    for msg in reversed(messages):
+        text = truncate_to_tokens(_field(msg, "text").strip(), max_message_tokens)
+        if not text:
+            continue
+        cost = estimate_tokens(text)
+        if selected and used + cost > token_budget:
+            break
+        role = "user" if _field(msg, "sender") == "user" else "model"
+        selected.append((role, text))
+        used += cost
+    selected.reverse()
+    return selected
+
+
+def build_contents(messages: list, user_id: Optional[str], token_budget: int,
+                   max_message_tokens: int) -> list:
+    """
+    Role-tagged Gemini `contents` for the conversation.
+    Consecutive turns from the same side are merged and the conversation
+    always opens with a user turn, as the API expects.
+    """
+    contents = []
+    for role, text in select_history(messages, token_budget, max_message_tokens):
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append({"text": text})
+        else:
+            contents.append({"role": role, "parts": [{"text": text}]})
+
+    while contents and contents[0]["role"] != "user":
+        contents.pop(0)
+
+    if user_id and contents:
+        contents[0]["parts"].insert(0, {"text": f"User ID: {user_id}."})
+    return contents
+
+
+def build_gemini_payload(messages: list, user_id: Optional[str], token_budget: int,
+                         max_message_tokens: int) -> dict:
+    """generateContent request body, with the system prompt as systemInstruction."""
+    return {
+        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+        "contents": build_contents(messages, user_id, token_budget, max_message_tokens),
+    }
+
+
+def build_flat_prompt(messages: list, user_id: Optional[str], token_budget: int,
+                      max_message_tokens: int) -> str:
+    """Single-string prompt for text-generation models without chat roles (HF fallback)."""
+    lines = [SYSTEM_PROMPT, f"User ID: {user_id}. " if user_id else ""]
+    for role, text in select_history(messages, token_budget, max_message_tokens):
+        sender = "Student" if role == "user" else "MindMate"
+        lines.append(f"{sender} :{text}")
+    return "\n".join(lines) + "\n"
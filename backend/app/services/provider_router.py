@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# A provider is (name, factory); the factory starts one call and resolves to
+# the reply text, or None when the provider failed or gave no usable answer.
+Provider = tuple[str, Callable[[], Awaitable[Optional[str]]]]
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per provider."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, name: str, q: float, min_samples: int = 20) -> Optional[float]:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+latency_tracker = LatencyTracker()
+
+
+async def _timed(name: str, factory) -> Optional[str]:
+    start = time.monotonic()
+    result = await factory()
+    if result:
+        latency_tracker.record(name, time.monotonic() - start)
+    return result
+
+
+async def race_providers(
+    providers: list[Provider],
+    deadline: float,
+    hedge: bool = True,
+    hedge_percentile: float = 0.95,
+    default_hedge_delay: float = 4.0,
+    min_samples: int = 20,
+) -> Optional[str]:
+    """
+    Walk the provider chain in order, returning the first good answer.
+    - A failed provider immediately starts the next one.
+    - With hedging on, the next provider is also started once the newest
+      running one exceeds its latency percentile (or default_hedge_delay).
+    - Losers are cancelled; nothing runs past the global deadline.
+    """
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + deadline
+    queue = list(providers)
+    running: dict[asyncio.Task, str] = {}
+    newest_started = loop.time()
+
+    def launch_next() -> Optional[str]:
+        nonlocal newest_started
+        if not queue:
+            return None
+        name, factory = queue.pop(0)
+        logger.info(f"[ProviderRouter] Starting provider '{name}'")
+        running[asyncio.create_task(_timed(name, factory))] = name
+        newest_started = loop.time()
+        return name
+
+    newest = launch_next()
+    try:
+        while running:
+            remaining = stop_at - loop.time()
+            if remaining <= 0:
+                logger.warning("[ProviderRouter] Global deadline reached, giving up.")
+                return None
+
+            timeout = remaining
+            if hedge and queue:
+                # Measured from when the newest provider started, so an unrelated
+                # early failure doesn't restart the hedge clock
+                delay = latency_tracker.percentile(newest, hedge_percentile, min_samples)
+                delay = delay if delay is not None else default_hedge_delay
+                timeout = min(remaining, max(0.0, newest_started + delay - loop.time()))
+
+            done, _ = await asyncio.wait(set(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge and queue and loop.time() < stop_at:
+                    logger.info(f"[ProviderRouter] '{newest}' is slow, hedging with next provider")
+                    newest = launch_next()
+                continue
+
+            for task in done:
+                name = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as exc:
+                    logger.error(f"[ProviderRouter] Provider '{name}' raised: {exc}", exc_info=True)
+                    result = None
+                if result:
+                    logger.info(f"[ProviderRouter] Answer from '{name}'")
+                    return result
+                # A failed provider hands over to the next in line straight away
+                newest = launch_next() or newest
+        return None
+    finally:
+        for task in running:
+            task.cancel()
@@ -0,0 +1,131 @@
+import string
+import unicodedata
+from typing import Optional
+
+import emoji
+
+# Built once at import instead of on every preprocess() call
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+TOXIC_EMOJIS = {"💩": 1.0, "🤬": 1.0, "😡": 1.0, "😠": 1.0}
+
+EMOJI_SENTIMENT = {
+    "😊": ("positive", 1.0),
+    "😀": ("positive", 1.0),
+    "😃": ("positive", 1.0),
+    "😄": ("positive", 1.0),
+    "😍": ("positive", 1.0),
+    "🥰": ("positive", 1.0),
+    "😂": ("positive", 0.8),
+    "😭": ("negative", 0.8),
+    "😢": ("negative", 0.8),
+    "😞": ("negative", 1.0),
+    "😡": ("negative", 1.0),
+    "😠": ("negative", 1.0),
+    "😔": ("negative", 0.8),
+    "😐": ("neutral", 0.7),
+    "😶": ("neutral", 0.7)
+}
+
+# Unicode blocks for the scripts our models and lexicon care about
+_SCRIPT_RANGES = (
+    (0x0980, 0x09FF, "bengali"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0600, 0x06FF, "arabic"),
+)
+
+_LANGUAGE_BY_SCRIPT = {
+    "latin": "en",
+    "bengali": "bn",
+    "cyrillic": "ru",
+    "devanagari": "hi",
+    "arabic": "ar",
+}
+
+
+def normalize_text(text: str) -> str:
+    """NFKC, lowercase, strip ASCII punctuation and surrounding whitespace."""
+    return unicodedata.normalize('NFKC', text).lower().translate(_PUNCTUATION_TABLE).strip()
+
+
+def _script(ch: str) -> str:
+    if ch.isascii() or ord(ch) < 0x0250:
+        return "latin"
+    code = ord(ch)
+    for lo, hi, name in _SCRIPT_RANGES:
+        if lo <= code <= hi:
+            return name
+    return "other"
+
+
+class TextFeatures:
+    """
+    Everything the analyzers need from a text, computed once:
+    normalized text, emoji hits with their sentiment/toxicity weights,
+    per-script letter counts with a language hint, and sizes.
+    """
+
+    __slots__ = (
+        "text", "normalized", "length", "token_count", "emojis",
+        "toxic_emoji", "sentiment_emoji", "script_counts", "script", "language_hint",
+    )
+
+    def __init__(self, text: str):
+        self.text = text
+        self.normalized = normalize_text(text)
+        self.length = len(self.normalized)
+        self.token_count = len(self.normalized.split())
+
+        # One pass over the characters for scripts, noting whether emoji
+        # detection is needed at all (emoji are category So)
+        script_counts = {}
+        maybe_emoji = False
+        for ch in self.normalized:
+            if ch.isalpha():
+                name = _script(ch)
+                script_counts[name] = script_counts.get(name, 0) + 1
+            elif not ch.isascii() and unicodedata.category(ch) == "So":
+                maybe_emoji = True
+        self.script_counts = script_counts
+
+        self.emojis = tuple(item["emoji"] for item in emoji.emoji_list(self.normalized)) if maybe_emoji else ()
+        # First matching emoji wins, as in the original per-analyzer checks
+        self.toxic_emoji: Optional[tuple[str, float]] = next(
+            (("toxic", TOXIC_EMOJIS[e]) for e in self.emojis if e in TOXIC_EMOJIS), None
+        )
+        self.sentiment_emoji: Optional[tuple[str, float]] = next(
+            (EMOJI_SENTIMENT[e] for e in self.emojis if e in EMOJI_SENTIMENT), None
+        )
+
+        if not script_counts:
+            self.script = None
+            self.language_hint = None
+        else:
+            self.script = max(script_counts, key=script_counts.get)
+            dominant_share = script_counts[self.script] / sum(script_counts.values())
+            if dominant_share < 0.8:
+                self.language_hint = "mixed"
+            else:
+                self.language_hint = _LANGUAGE_BY_SCRIPT.get(self.script)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.normalized
+
+    def as_dict(self) -> dict:
+        return {
+            "normalized": self.normalized,
+            "length": self.length,
+            "token_count": self.token_count,
+            "emojis": list(self.emojis),
+            "toxic_emoji": self.toxic_emoji,
+            "sentiment_emoji": self.sentiment_emoji,
+            "script_counts": self.script_counts,
+            "script": self.script,
+            "language_hint": self.language_hint,
+        }
+
+
+def extract_features(text: str) -> TextFeatures:
+    return TextFeatures(text)
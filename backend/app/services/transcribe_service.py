@@ -1,42 +1,104 @@
-import os
-import tempfile
-import httpx
+import re
+import time
+import asyncio
 import logging
+from typing import AsyncIterable, Union
+
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import call_status, observe_upstream
+from app.core.rate_limit import upstream_governor
+from app.services.hf_inference import model_warmth, note_hf_response
+from app.services.audio_service import (
+    WAV_CONTENT_TYPES,
+    decode_audio,
+    encode_wav,
+    normalize_wav,
+    split_on_silence,
+)
 
 logger = logging.getLogger(__name__)
 
 HF_API_KEY = settings.HF_API_KEY
-API_URL = "https://api-inference.huggingface.co/models/openai/whisper-large-v3-turbo"
+WHISPER_MODEL = "openai/whisper-large-v3-turbo"
+API_URL = f"{settings.HF_INFERENCE_URL}/{WHISPER_MODEL}"
 
 HEADERS = {
     "Authorization": f"Bearer {HF_API_KEY}"
 }
 
 
-async def transcribe_audio(file_bytes: bytes, content_type: str = "audio/webm") -> dict:
+class AudioTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_AUDIO_UPLOAD_BYTES."""
+
+
+async def iter_upload(file, max_bytes: int = None, chunk_size: int = None):
     """
-    Send audio bytes to Hugging Face Whisper API for transcription.
-    Handles dynamic content types (mp3, wav, webm).
+    Read an UploadFile in chunks, enforcing the size limit while streaming,
+    so only one chunk is held in memory at a time.
     """
-    tmp_path = None
-    try:
-        # Choose suffix based on MIME type
-        suffix = guess_suffix(content_type)
+    max_bytes = max_bytes or settings.MAX_AUDIO_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.AUDIO_STREAM_CHUNK_BYTES
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(file_bytes)
-            tmp_path = tmp.name
+    # Reject early when the size is already known
+    if getattr(file, "size", None) and file.size > max_bytes:
+        raise AudioTooLargeError(f"Audio exceeds {max_bytes} bytes.")
 
-        async with httpx.AsyncClient(timeout=90.0) as client:
-            with open(tmp_path, "rb") as f:
-                response = await client.post(
-                    API_URL,
-                    headers={**HEADERS, "Content-Type": content_type},
-                    content=f.read()  # raw audio upload
-                )
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise AudioTooLargeError(f"Audio exceeds {max_bytes} bytes.")
+        yield chunk
+
+
+async def transcribe_audio(
+    audio: Union[bytes, AsyncIterable[bytes]],
+    content_type: str = "audio/webm",
+    client=None
+) -> dict:
+    """
+    Send audio to Hugging Face Whisper API for transcription.
+    Accepts raw bytes or an async byte stream (see iter_upload), which is
+    forwarded as the request body without buffering the whole clip.
+    Handles dynamic content types (mp3, wav, webm).
+    While Whisper is loading the request asks HF to wait for it; an unexpected
+    "loading" 503 is retried that way when the audio is in memory and the
+    estimated wait fits HF_WAIT_FOR_MODEL_BUDGET.
+    Raises UpstreamBusyError when no Whisper slot frees up in time.
+    """
+    lease = await upstream_governor.acquire("whisper")
+    start = time.monotonic()
+    response = None
+    try:
+        client = client or get_http_client()
+        headers = {**HEADERS, "Content-Type": content_type or "audio/webm"}
+        if model_warmth.eta(WHISPER_MODEL) > 0:
+            headers["x-wait-for-model"] = "true"
+        response = await client.post(
+            API_URL,
+            headers=headers,
+            content=audio,  # raw audio upload
+            timeout=90.0
+        )
+        loading = note_hf_response(WHISPER_MODEL, response)
+        if (loading is not None and isinstance(audio, bytes) and "x-wait-for-model" not in headers
+                and loading <= settings.HF_WAIT_FOR_MODEL_BUDGET):
+            logger.info(f"[TranscribeService] Whisper is loading (~{loading:.0f}s), waiting for it")
+            response = await client.post(
+                API_URL,
+                headers={**headers, "x-wait-for-model": "true"},
+                content=audio,
+                timeout=90.0
+            )
+            loading = note_hf_response(WHISPER_MODEL, response)
 
         logger.info(f"[TranscribeService] HF status={response.status_code}")
+        status = "loading" if loading is not None else call_status(response)
+        observe_upstream("whisper", WHISPER_MODEL, status, time.monotonic() - start)
 
         if response.status_code != 200:
             return {"error": response.text}
@@ -46,22 +108,124 @@ async def transcribe_audio(file_bytes: bytes, content_type: str = "audio/webm")
 
         return {"text": result.get("text", "")}
 
+    except AudioTooLargeError:
+        raise
     except Exception as exc:
         logger.error(f"[TranscribeService] Exception: {exc}", exc_info=True)
+        if response is None:
+            observe_upstream("whisper", WHISPER_MODEL, call_status(exc=exc), time.monotonic() - start)
         return {"error": str(exc)}
-
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
-
-
-def guess_suffix(content_type: str) -> str:
-    """Return file extension based on MIME type."""
-    mapping = {
-        "audio/webm": ".webm",
-        "audio/mpeg": ".mp3",
-        "audio/wav": ".wav",
-        "audio/x-wav": ".wav",
-        "audio/ogg": ".ogg"
-    }
-    return mapping.get(content_type, ".tmp")
+        await upstream_governor.release(lease)
+
+
+def _words(text: str) -> list:
+    return re.sub(r"[^\w\s]", "", text.lower()).split()
+
+
+def stitch_transcripts(texts: list, max_overlap_words: int = 12) -> str:
+    """
+    Join chunk transcripts in order, dropping words repeated across the
+    overlap between neighbouring chunks.
+    """
+    merged = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            continue
+        if merged:
+            tail = _words(" ".join(merged[-max_overlap_words:]))
+            head = _words(" ".join(words[:max_overlap_words]))
+            overlap = 0
+            for k in range(min(len(tail), len(head)), 0, -1):
+                if tail[-k:] == head[:k]:
+                    overlap = k
+                    break
+            words = words[overlap:]
+        merged.extend(words)
+    return " ".join(merged)
+
+
+async def transcribe_chunked(audio_bytes: bytes, content_type: str = "audio/webm", client=None) -> dict:
+    """
+    Transcribe a long recording by splitting it at silence into overlapping
+    windows, transcribing them concurrently (bounded by TRANSCRIBE_MAX_PARALLEL)
+    and stitching the text back in order. Clips that are short or can't be
+    decoded locally go to Whisper in one request.
+    """
+    decoded = await decode_audio(audio_bytes, content_type)
+    if decoded is None:
+        return await transcribe_audio(audio_bytes, content_type, client)
+
+    samples, rate = decoded
+    windows = split_on_silence(
+        samples,
+        rate,
+        target_seconds=settings.TRANSCRIBE_CHUNK_SECONDS,
+        overlap_seconds=settings.TRANSCRIBE_CHUNK_OVERLAP_SECONDS,
+        search_seconds=settings.TRANSCRIBE_SILENCE_SEARCH_SECONDS
+    )
+    if len(windows) == 1:
+        return await transcribe_audio(audio_bytes, content_type, client)
+
+    logger.info(f"[TranscribeService] Transcribing {len(windows)} chunks of {len(samples) / rate:.1f}s clip")
+    semaphore = asyncio.Semaphore(settings.TRANSCRIBE_MAX_PARALLEL)
+
+    async def run(start: int, end: int) -> dict:
+        async with semaphore:
+            return await transcribe_audio(encode_wav(samples[start:end], rate), "audio/wav", client)
+
+    results = await asyncio.gather(*[run(start, end) for start, end in windows])
+    errors = [r["error"] for r in results if "error" in r]
+    if errors:
+        return {"error": errors[0]}
+    return {"text": stitch_transcripts([r.get("text", "") for r in results])}
+
+
+def prepare_audio(audio_bytes: bytes, content_type: str):
+    """
+    Shrink PCM/WAV uploads before Whisper: mono, AUDIO_TARGET_SAMPLE_RATE,
+    leading/trailing silence trimmed. Returns (bytes, content_type), or
+    None when the clip is silent and no upstream call is needed.
+    Other formats pass through untouched.
+    """
+    if not settings.AUDIO_NORMALIZE_ENABLED or content_type not in WAV_CONTENT_TYPES:
+        return audio_bytes, content_type
+
+    normalized, silent = normalize_wav(
+        audio_bytes,
+        target_rate=settings.AUDIO_TARGET_SAMPLE_RATE,
+        threshold_db=settings.AUDIO_SILENCE_THRESHOLD_DB
+    )
+    if silent:
+        return None
+    if normalized is not audio_bytes:
+        logger.info(f"[TranscribeService] Normalized WAV {len(audio_bytes)} -> {len(normalized)} bytes")
+        return normalized, "audio/wav"
+    return audio_bytes, content_type
+
+
+async def transcribe_upload(file, client=None) -> dict:
+    """
+    Transcribe an UploadFile. Compressed uploads are streamed straight to
+    Whisper. The upload is read into memory (size-limited) only when it needs
+    local processing: WAV normalization or chunked transcription.
+    """
+    content_type = file.content_type
+    needs_normalize = settings.AUDIO_NORMALIZE_ENABLED and content_type in WAV_CONTENT_TYPES
+    if not settings.TRANSCRIBE_CHUNKING_ENABLED and not needs_normalize:
+        return await transcribe_audio(iter_upload(file), content_type, client)
+
+    buf = bytearray()
+    async for chunk in iter_upload(file):
+        buf.extend(chunk)
+
+    prepared = prepare_audio(bytes(buf), content_type)
+    if prepared is None:
+        logger.info("[TranscribeService] Silent clip, skipping Whisper.")
+        return {"text": ""}
+    audio_bytes, content_type = prepared
+
+    if settings.TRANSCRIBE_CHUNKING_ENABLED:
+        return await transcribe_chunked(audio_bytes, content_type, client)
+    return await transcribe_audio(audio_bytes, content_type, client)
@@ -0,0 +1,221 @@
+"""
+Drive MindMate endpoints at a fixed concurrency and report throughput and
+latency percentiles per scenario, optionally saving a baseline and comparing
+against a previous one.
+
+    python -m bench.loadtest --base-url http://127.0.0.1:8000 --concurrency 32 --duration 30 \\
+        --save stubs-c32 --compare stubs-c32
+
+Run the API against bench/stubs.py with RATE_LIMIT_ENABLED=false, or most
+requests will be answered 429. Exits with status 1 when --compare finds a
+regression beyond --tolerance.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+import wave
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+SCENARIOS = ("chat", "voice", "peer", "comment", "mood")
+
+TEXTS = [
+    "i feel anxious about my exams this week",
+    "today was a good day, i went for a walk and felt calm",
+    "i can't sleep and everything feels heavy",
+    "thanks everyone for the support on my last post",
+    "does anyone have tips for staying focused while studying",
+    "i'm grateful for my friends but still feel lonely sometimes",
+    "work has been stressful and i keep snapping at people",
+    "finally talked to a counselor and it went better than expected",
+]
+
+
+def _wav_clip(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+class Scenario:
+    """Builds one request for an endpoint. `unique` appends a nonce to defeat verdict caches."""
+
+    def __init__(self, name: str, unique: bool):
+        self.name = name
+        self.unique = unique
+        self._audio = _wav_clip() if name == "voice" else None
+
+    def _text(self) -> str:
+        text = random.choice(TEXTS)
+        return f"{text} {uuid.uuid4().hex[:8]}" if self.unique else text
+
+    async def send(self, client: httpx.AsyncClient, user_id: str) -> httpx.Response:
+        if self.name == "chat":
+            return await client.post("/chat", json={"user_id": user_id, "messages": [{"sender": "user", "text": self._text()}]})
+        if self.name == "voice":
+            files = {"file": ("clip.wav", self._audio, "audio/wav")}
+            return await client.post("/chat/voice", params={"user_id": user_id}, files=files)
+        if self.name == "peer":
+            return await client.post("/peer", json={"user_id": user_id, "content": self._text()})
+        if self.name == "comment":
+            return await client.post("/comment", json={"user_id": user_id, "post_id": "bench-post", "content": self._text()})
+        if self.name == "mood":
+            return await client.post("/mood", json={"user_id": user_id, "mood_text": self._text()})
+        raise ValueError(f"Unknown scenario {self.name}")
+
+
+async def run_scenario(base_url: str, scenario: Scenario, concurrency: int, duration: float,
+                       max_requests: int, timeout: float) -> dict:
+    latencies = []
+    statuses: dict = {}
+    sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(n: int):
+            nonlocal sent
+            user_id = f"bench-{n}"
+            while time.perf_counter() < deadline and (not max_requests or sent < max_requests):
+                sent += 1
+                start = time.perf_counter()
+                try:
+                    response = await scenario.send(client, user_id)
+                    status = str(response.status_code)
+                except httpx.TimeoutException:
+                    status = "timeout"
+                except httpx.HTTPError:
+                    status = "error"
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).round(1) if latencies else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "error_rate": round(1 - ok / len(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "statuses": statuses,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """Regressions as human-readable strings: slower percentiles, lower throughput, more errors."""
+    problems = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[key] and now[key] > before[key] * (1 + tolerance):
+                problems.append(f"{name}: {key} {before[key]} -> {now[key]} (+{now[key] / before[key] - 1:.0%})")
+        if before["throughput_rps"] and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {before['throughput_rps']} -> {now['throughput_rps']} rps")
+        if now["error_rate"] > before["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {before['error_rate']:.2%} -> {now['error_rate']:.2%}")
+    return problems
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _print_table(results: dict) -> None:
+    print(f"{'scenario':<10}{'reqs':>8}{'ok':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['requests']:>8}{r['ok']:>8}{r['throughput_rps']:>10}"
+            f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}  {r['statuses']}"
+        )
+
+
+async def main_async(args) -> int:
+    results = {}
+    for name in args.scenarios.split(","):
+        scenario = Scenario(name.strip(), unique=not args.repeat_texts)
+        # Short unmeasured warm-up so connection setup and cold models don't skew the run
+        if args.warmup:
+            await run_scenario(args.base_url, scenario, args.concurrency, args.warmup, 0, args.timeout)
+        results[scenario.name] = await run_scenario(
+            args.base_url, scenario, args.concurrency, args.duration, args.requests, args.timeout
+        )
+    _print_table(results)
+
+    status = 0
+    baseline_path = BASELINE_DIR / f"{args.compare}.json" if args.compare else None
+    if baseline_path and not baseline_path.exists():
+        print(f"No baseline '{args.compare}' yet, nothing to compare.")
+    elif baseline_path:
+        baseline = json.loads(baseline_path.read_text())
+        problems = compare(baseline["results"], results, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            status = 1
+        else:
+            print(f"No regressions against '{args.compare}' ({baseline.get('revision') or 'unknown revision'}).")
+
+    if args.save and status == 0:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / f"{args.save}.json").write_text(json.dumps({
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "results": results,
+        }, indent=2))
+        print(f"Saved baseline '{args.save}'.")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test MindMate endpoints.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per scenario")
+    parser.add_argument("--requests", type=int, default=0, help="Stop a scenario after this many requests (0 = duration only)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--repeat-texts", action="store_true", help="Reuse a fixed text pool so caches get hits")
+    parser.add_argument("--save", help="Save results as bench/baselines/<name>.json (skipped on regression)")
+    parser.add_argument("--compare", help="Compare against bench/baselines/<name>.json")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Local stand-ins for the upstreams MindMate calls (HF inference incl. Whisper,
+and Gemini generateContent / streamGenerateContent), so load tests don't burn
+real quota.
+
+    python -m bench.stubs --port 8900 --hf 80:0.5:0.01 --gemini 700:0.4 --cold-start 20
+
+and start the API against it:
+
+    HF_INFERENCE_URL=http://127.0.0.1:8900/models
+    GEMINI_BASE_URL=http://127.0.0.1:8900/v1beta
+    HF_API_KEY=stub GEMINI_API_KEY=stub
+
+Latencies are log-normal around the given median. Models start cold when
+--cold-start is set and answer 503 "loading" with estimated_time until they
+have loaded, unless the request asks to wait_for_model.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOXIC_WORDS = {"hate", "idiot", "stupid", "kill", "worthless", "ugly"}
+NEGATIVE_WORDS = {"sad", "anxious", "tired", "lonely", "stressed", "bad", "awful", "cry"}
+POSITIVE_WORDS = {"happy", "great", "good", "calm", "grateful", "excited", "better"}
+
+GENERATION_MODELS = {"tiiuae/falcon-7b-instruct", "facebook/blenderbot-3B", "gpt2"}
+
+REPLY = (
+    "It sounds like today has been a lot to carry. Thank you for sharing it with me. "
+    "Would it help to talk through what felt hardest, or to try a short breathing exercise together?"
+)
+TRANSCRIPT = "i have been feeling a bit anxious about my exams this week"
+
+
+class LatencyProfile:
+    """Log-normal latency around `median_ms`, failing with `error_rate` (HTTP 500)."""
+
+    def __init__(self, median_ms: float, sigma: float = 0.5, error_rate: float = 0.0):
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.error_rate = error_rate
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """'median_ms[:sigma[:error_rate]]', e.g. '80:0.5:0.01'."""
+        parts = [float(p) for p in spec.split(":")]
+        return cls(*parts)
+
+    def sample(self) -> float:
+        if self.sigma <= 0:
+            return self.median
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class ModelWarmth:
+    """
+    Cold-start simulation: a model becomes ready `cold_start` seconds after it
+    is first requested, and a warm model is evicted again with `loading_rate`
+    probability per request or after `idle_evict` seconds without traffic.
+    """
+
+    def __init__(self, cold_start: float, loading_rate: float, idle_evict: float):
+        self.cold_start = cold_start
+        self.loading_rate = loading_rate
+        self.idle_evict = idle_evict
+        self._ready_at: dict = {}
+        self._last_seen: dict = {}
+
+    def remaining(self, model: str) -> float:
+        """Seconds until `model` is loaded (0 when warm)."""
+        if self.cold_start <= 0:
+            return 0.0
+        now = time.monotonic()
+        last = self._last_seen.get(model)
+        self._last_seen[model] = now
+        idle = self.idle_evict and last is not None and now - last > self.idle_evict
+        if model not in self._ready_at or idle or random.random() < self.loading_rate:
+            if model not in self._ready_at or self._ready_at[model] <= now:
+                self._ready_at[model] = now + self.cold_start
+        return max(0.0, self._ready_at[model] - now)
+
+
+class StubState:
+    def __init__(self, hf: LatencyProfile, whisper: LatencyProfile, gemini: LatencyProfile,
+                 warmth: ModelWarmth, stream_chunks: int):
+        self.hf = hf
+        self.whisper = whisper
+        self.gemini = gemini
+        self.warmth = warmth
+        self.stream_chunks = stream_chunks
+        self.counts: dict = {}
+
+    def count(self, kind: str, status: int) -> None:
+        key = f"{kind}:{status}"
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def _words(text: str) -> set:
+    return set(text.lower().split())
+
+
+def classify(model: str, text: str) -> list:
+    """Deterministic classifier output in the HF text-classification shape."""
+    words = _words(text)
+    if "sentiment" in model or model == "distilroberta-base":
+        if words & NEGATIVE_WORDS:
+            top = ("LABEL_0", 0.88)
+        elif words & POSITIVE_WORDS:
+            top = ("LABEL_1", 0.91)
+        else:
+            top = ("LABEL_2", 0.74)
+        rest = [label for label in ("LABEL_0", "LABEL_1", "LABEL_2") if label != top[0]]
+        share = round((1 - top[1]) / 2, 4)
+        return [{"label": top[0], "score": top[1]}] + [{"label": label, "score": share} for label in rest]
+    if words & TOXIC_WORDS:
+        return [{"label": "toxic", "score": 0.93}, {"label": "non-toxic", "score": 0.07}]
+    return [{"label": "non-toxic", "score": 0.96}, {"label": "toxic", "score": 0.04}]
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="MindMate upstream stubs")
+
+    @app.get("/stats")
+    async def stats():
+        return state.counts
+
+    @app.post("/models/{model:path}")
+    async def hf_inference(model: str, request: Request):
+        whisper = "whisper" in model
+        profile = state.whisper if whisper else state.hf
+        body = await request.body()
+        payload = {} if whisper else json.loads(body or b"{}")
+        wait = request.headers.get("x-wait-for-model", "").lower() == "true" or bool(
+            (payload.get("options") or {}).get("wait_for_model")
+        )
+
+        loading = state.warmth.remaining(model)
+        if loading > 0:
+            if not wait:
+                state.count("hf", 503)
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": f"Model {model} is currently loading", "estimated_time": round(loading, 1)},
+                )
+            await asyncio.sleep(loading)
+
+        await asyncio.sleep(profile.sample())
+        if profile.fails():
+            state.count("hf", 500)
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+        state.count("hf", 200)
+        if whisper:
+            return {"text": TRANSCRIPT}
+        if model in GENERATION_MODELS:
+            return [{"generated_text": REPLY}]
+        inputs = payload.get("inputs", "")
+        if isinstance(inputs, list):
+            return [classify(model, text) for text in inputs]
+        return [classify(model, inputs)]
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str):
+        _, _, action = model_action.partition(":")
+        first = state.gemini.sample()
+        if state.gemini.fails():
+            await asyncio.sleep(first)
+            state.count("gemini", 500)
+            return JSONResponse(status_code=500, content={"error": {"code": 500, "message": "Internal error"}})
+        state.count("gemini", 200)
+
+        if action != "streamGenerateContent":
+            await asyncio.sleep(first)
+            return {"candidates": [{"content": {"parts": [{"text": REPLY}], "role": "model"}}]}
+
+        # First chunk after the sampled latency, the rest spread over half that again
+        words = REPLY.split(" ")
+        size = max(1, math.ceil(len(words) / state.stream_chunks))
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+        async def events():
+            await asyncio.sleep(first)
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(first / 2 / len(pieces))
+                chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local HF / Whisper / Gemini stand-ins.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--hf", default="80:0.5:0", help="HF classifier latency 'median_ms[:sigma[:error_rate]]'")
+    parser.add_argument("--whisper", default="900:0.4:0", help="Whisper latency profile")
+    parser.add_argument("--gemini", default="700:0.4:0", help="Gemini latency profile (time to first chunk when streaming)")
+    parser.add_argument("--cold-start", type=float, default=0.0, help="Seconds a cold model takes to load (0 = always warm)")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="Chance per request that a warm model is evicted")
+    parser.add_argument("--idle-evict", type=float, default=0.0, help="Evict models idle this many seconds (0 = never)")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    state = StubState(
+        LatencyProfile.parse(args.hf),
+        LatencyProfile.parse(args.whisper),
+        LatencyProfile.parse(args.gemini),
+        ModelWarmth(args.cold_start, args.loading_rate, args.idle_evict),
+        args.stream_chunks,
+    )
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
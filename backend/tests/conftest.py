@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    # The app only runs on asyncio; don't repeat every async test under trio
+    return "asyncio"
@@ -0,0 +1,57 @@
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HealthScoreboard
+from app.core.config import settings
+
+
+def _opened_breaker(cooled: bool = True) -> CircuitBreaker:
+    breaker = CircuitBreaker("model", window=4, min_calls=1, error_threshold=0.5, cooldown=60)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    if cooled:
+        breaker.opened_at -= 60
+    return breaker
+
+
+def test_open_breaker_skips_calls_until_cooldown():
+    breaker = _opened_breaker(cooled=False)
+    assert not breaker.available()
+    assert not breaker.allow()
+
+
+def test_available_does_not_claim_the_probe():
+    breaker = _opened_breaker()
+    for _ in range(3):
+        assert breaker.available()
+    assert breaker.probe_started is None
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # The probe is out: nobody else may call until it reports back
+    assert not breaker.available()
+    assert not breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens():
+    breaker = _opened_breaker()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker = _opened_breaker()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_healthy_leaves_the_probe_to_the_call(monkeypatch):
+    monkeypatch.setattr(settings, "BREAKER_ENABLED", True)
+    monkeypatch.setattr(settings, "BREAKER_MIN_CALLS", 1)
+    board = HealthScoreboard()
+    board.record("a", ok=False)
+    board.record("b", ok=True)
+    board.get("a").opened_at -= settings.BREAKER_COOLDOWN_SECONDS
+
+    # Filtering twice (e.g. routing, then a retry) keeps "a" eligible
+    assert board.healthy(["a", "b"]) == ["a", "b"]
+    assert board.healthy(["a", "b"]) == ["a", "b"]
+    assert board.allow("a")
+    assert board.healthy(["a", "b"]) == ["b"]
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import VerdictCache
+from app.core.circuit_breaker import HealthScoreboard
+from app.core.config import settings
+from app.services import moderation_service
+from app.services.moderation_service import SENTIMENT_MODELS, TOXICITY_MODELS, ensemble_mood, moderate_text_detailed
+
+pytestmark = pytest.mark.anyio
+
+TEXT = "exams tomorrow and i have not slept"
+
+
+@pytest.fixture
+def ensemble(monkeypatch):
+    """Fresh cache and breakers; `replies[model]` is (delay, label) or None for a failed call."""
+    replies = {}
+
+    async def query_model(client, model, text):
+        reply = replies.get(model, (0, "non-toxic"))
+        if reply is None:
+            return None
+        delay, label = reply
+        await asyncio.sleep(delay)
+        return [[{"label": label, "score": 0.9}]]
+
+    monkeypatch.setattr(moderation_service, "query_model", query_model)
+    monkeypatch.setattr(moderation_service, "verdict_cache", VerdictCache(max_size=100, ttl=60))
+    monkeypatch.setattr(moderation_service, "scoreboard", HealthScoreboard())
+    monkeypatch.setattr(settings, "VERDICT_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "LEXICON_PREFILTER_ENABLED", False)
+    monkeypatch.setattr(settings, "MODERATION_QUORUM", False)
+    return replies
+
+
+async def _source_of_second_call() -> str:
+    await moderate_text_detailed(TEXT, client=object())
+    return (await moderate_text_detailed(TEXT, client=object()))["source"]
+
+
+async def test_full_ensemble_verdict_is_cached(ensemble):
+    assert await _source_of_second_call() == "cache"
+
+
+async def test_verdict_without_an_open_circuit_model_is_not_cached(ensemble):
+    breaker = moderation_service.scoreboard.get(TOXICITY_MODELS[0])
+    for _ in range(settings.BREAKER_MIN_CALLS):
+        breaker.record_failure()
+
+    verdict = await moderate_text_detailed(TEXT, client=object())
+
+    assert TOXICITY_MODELS[0] not in verdict["models"]
+    assert await _source_of_second_call() == "ensemble"
+
+
+async def test_quorum_verdict_is_not_cached(ensemble, monkeypatch):
+    monkeypatch.setattr(settings, "MODERATION_QUORUM", True)
+    ensemble[TOXICITY_MODELS[-1]] = (5.0, "toxic")
+
+    assert await _source_of_second_call() == "ensemble"
+
+
+async def test_sentiment_cached_only_when_every_model_answered(ensemble):
+    ensemble[SENTIMENT_MODELS[0]] = None
+    await ensemble_mood(TEXT, client=object())
+    key = moderation_service.verdict_cache.make_key("sentiment", SENTIMENT_MODELS, moderation_service.preprocess(TEXT))
+    assert await moderation_service.verdict_cache.get(key) is None
+
+    del ensemble[SENTIMENT_MODELS[0]]
+    await ensemble_mood(TEXT, client=object())
+    assert await moderation_service.verdict_cache.get(key) is not None
@@ -0,0 +1,49 @@
+import httpx
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.services import gemini_service
+
+pytestmark = pytest.mark.anyio
+
+
+def _client(body: bytes) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """A fresh gemini breaker and a canned HF fallback."""
+    breaker = CircuitBreaker("gemini", window=10, min_calls=1, error_threshold=0.5, cooldown=30)
+    monkeypatch.setattr(gemini_service, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(gemini_service.scoreboard, "get", lambda name: breaker)
+
+    async def fallback(client, full_prompt):
+        return "fallback reply"
+
+    monkeypatch.setattr(gemini_service, "get_hf_fallback_response", fallback)
+    return breaker
+
+
+async def _collect(client) -> list:
+    messages = [{"sender": "user", "text": "hello"}]
+    return [chunk async for chunk in gemini_service.stream_gemini_response(messages, client=client)]
+
+
+async def test_stream_yields_chunks_and_records_success(gemini):
+    body = b'data: {"candidates": [{"content": {"parts": [{"text": "Hi "}]}}]}\r\n\r\n' \
+           b'data: {"candidates": [{"content": {"parts": [{"text": "there"}]}}]}\r\n\r\n'
+    async with _client(body) as client:
+        assert await _collect(client) == ["Hi ", "there"]
+    assert gemini.error_rate == 0.0
+    assert gemini.state == "closed"
+
+
+async def test_empty_stream_counts_as_failure_and_falls_back(gemini):
+    body = b'data: {"candidates": [{"content": {"parts": []}}]}\r\n\r\n'
+    async with _client(body) as client:
+        assert await _collect(client) == ["fallback reply"]
+    assert gemini.error_rate == 1.0
+    assert gemini.state == "open"
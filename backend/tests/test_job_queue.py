@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from app.core import job_queue
+from app.core.job_queue import JobQueue, MemoryJobBackend
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Stands in for the `time` module inside job_queue so deadlines can be stepped over."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+def _queue(handler, **kwargs) -> JobQueue:
+    """A queue driven by hand: in-memory backend, no worker tasks."""
+    queue = JobQueue("test", handler, retry_backoff=2.0, visibility_timeout=60.0, **kwargs)
+    queue.backend = MemoryJobBackend(result_ttl=3600)
+    return queue
+
+
+def _flaky(failures: int):
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        if len(calls) <= failures:
+            raise RuntimeError("upstream down")
+        return {"ok": True}
+
+    return handler, calls
+
+
+async def test_failed_attempt_is_retried_after_backoff(clock):
+    handler, calls = _flaky(failures=1)
+    queue = _queue(handler, max_attempts=3)
+    job_id = await queue.submit({"text": "hi"})
+
+    await queue._process(await queue.backend.reserve(60))
+    job = await queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 1, "upstream down")
+    assert queue.retried == 1
+
+    # Invisible until the backoff has passed
+    assert await queue.backend.requeue_expired() == 0
+    assert await queue.backend.reserve(60) is None
+    clock.now += 2.0
+    assert await queue.backend.requeue_expired() == 1
+
+    await queue._process(await queue.backend.reserve(60))
+    job = await queue.get(job_id)
+    assert (job["status"], job["attempts"], job["result"]) == ("done", 2, {"ok": True})
+    assert len(calls) == 2
+    assert await queue.backend.in_flight() == 0
+
+
+async def test_backoff_doubles_and_job_fails_after_max_attempts(clock):
+    handler, calls = _flaky(failures=10)
+    queue = _queue(handler, max_attempts=3)
+    job_id = await queue.submit({"text": "hi"})
+
+    for backoff in (2.0, 4.0):
+        await queue._process(await queue.backend.reserve(60))
+        clock.now += backoff - 0.1
+        assert await queue.backend.requeue_expired() == 0
+        clock.now += 0.1
+        assert await queue.backend.requeue_expired() == 1
+
+    await queue._process(await queue.backend.reserve(60))
+    job = await queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 3, "upstream down")
+    assert (queue.retried, queue.failed) == (2, 1)
+    assert await queue.backend.in_flight() == 0
+    assert await queue.backend.depth() == 0
+
+
+async def test_unacked_job_is_handed_out_again_after_visibility_timeout(clock):
+    handler, calls = _flaky(failures=0)
+    queue = _queue(handler)
+    job_id = await queue.submit({"text": "hi"})
+
+    # A worker reserves the job and dies without acking it
+    assert (await queue.backend.reserve(65))["id"] == job_id
+    clock.now += 64
+    assert await queue.backend.requeue_expired() == 0
+    clock.now += 1
+    assert await queue.backend.requeue_expired() == 1
+
+    await queue._process(await queue.backend.reserve(65))
+    assert (await queue.get(job_id))["status"] == "done"
+    assert len(calls) == 1
+
+
+async def test_redelivered_job_with_no_attempts_left_fails(clock):
+    handler, calls = _flaky(failures=0)
+    queue = _queue(handler, max_attempts=2)
+    job_id = await queue.submit({"text": "hi"})
+    job = await queue.backend.reserve(65)
+    job["attempts"] = 2  # both attempts were spent by workers that crashed mid-job
+
+    await queue._process(job)
+    job = await queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "Visibility timeout exceeded.")
+    assert calls == []
+
+
+async def test_hung_handler_times_out_and_is_retried():
+    async def hang(payload):
+        await asyncio.sleep(10)
+
+    queue = JobQueue("test", hang, visibility_timeout=0.05, max_attempts=2)
+    queue.backend = MemoryJobBackend(result_ttl=3600)
+    job_id = await queue.submit({"text": "hi"})
+
+    await queue._process(await queue.backend.reserve(1))
+    job = await queue.get(job_id)
+    assert (job["status"], job["error"]) == ("queued", "TimeoutError")
+
+
+async def test_workers_retry_until_done():
+    handler, calls = _flaky(failures=1)
+    queue = JobQueue("test", handler, workers=2, visibility_timeout=1.0, retry_backoff=0.01)
+    await queue.start()
+    try:
+        job_id = await queue.submit({"text": "hi"})
+        for _ in range(100):
+            job = await queue.get(job_id)
+            if job["status"] == "done":
+                break
+            await asyncio.sleep(0.05)
+        assert (job["status"], job["attempts"], job["result"]) == ("done", 2, {"ok": True})
+    finally:
+        await queue.stop()
@@ -0,0 +1,70 @@
+import pytest
+
+from app.core.config import settings
+from app.services import moderation_service
+from app.services.lexicon_service import BENIGN_SCORE, TOXIC_SCORE, AhoCorasick, load_lexicon
+from app.services.text_features import normalize_text
+
+LEXICON = load_lexicon(normalize=normalize_text, benign_max_tokens=6)
+
+
+def verdict(text: str):
+    return LEXICON.verdict(normalize_text(text))
+
+
+@pytest.mark.parametrize("text", [
+    "you are a bitch",
+    "Bitch!",
+    "please just kill yourself",
+    "tui ekta bokachoda",
+    "তুই একটা মাগি",
+])
+def test_whole_word_toxic_terms_are_flagged(text):
+    assert verdict(text) == ("toxic", TOXIC_SCORE)
+
+
+@pytest.mark.parametrize("text", [
+    "my cat got stuck in a bitchy mood",  # term inside a longer word
+    "I visited Scunthorpe last weekend",
+    "I need to skill yourself up for the exam",  # phrase starting mid-word
+    "kyst is a medical word",
+    "মাগিরা",  # Bangla term with a suffix attached
+])
+def test_terms_inside_other_words_are_not_flagged(text):
+    assert verdict(text)[0] != "toxic"
+
+
+@pytest.mark.parametrize("text", ["thanks, take care!", "Hello", "ধন্যবাদ", "valo theko"])
+def test_short_texts_made_only_of_safe_terms_pass(text):
+    assert verdict(text) == ("not-toxic", BENIGN_SCORE)
+
+
+@pytest.mark.parametrize("text", [
+    "hiking was fun",  # "hi" only as a prefix
+    "thanks for nothing",  # safe term plus uncovered words
+    "thanks thanks thanks thanks thanks thanks thanks",  # over benign_max_tokens
+    "",
+])
+def test_everything_else_is_left_to_the_ensemble(text):
+    assert verdict(text) == (None, 0.0)
+
+
+def test_matcher_reports_overlapping_terms():
+    matcher = AhoCorasick(["he", "she", "hers"])
+    assert sorted(matcher.finditer("ushers")) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+@pytest.mark.anyio
+async def test_chat_sends_lexicon_hits_on_to_the_ensemble(monkeypatch):
+    async def query_model(client, model, text):
+        return [[{"label": "non-toxic", "score": 0.9}]]
+
+    monkeypatch.setattr(moderation_service, "query_model", query_model)
+    monkeypatch.setattr(settings, "VERDICT_CACHE_ENABLED", False)
+    text = "someone at school told me to kill yourself"
+
+    blocked = await moderation_service.moderate_text_detailed(text, client=object())
+    judged = await moderation_service.moderate_text_detailed(text, client=object(), lexicon_blocks=False)
+
+    assert (blocked["label"], blocked["source"]) == ("toxic", "lexicon")
+    assert (judged["label"], judged["source"]) == ("not-toxic", "ensemble")
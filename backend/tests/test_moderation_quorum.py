@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.services import moderation_service
+from app.services.moderation_service import collect_toxicity_votes, outcome_decided
+
+pytestmark = pytest.mark.anyio
+
+
+def _fake_models(monkeypatch, replies: dict):
+    """
+    Route query_model to per-model (delay, label, score) replies and record
+    which calls finished and which were cancelled.
+    """
+    finished, cancelled = [], []
+
+    async def query_model(client, model, text):
+        delay, label, score = replies[model]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        finished.append(model)
+        return [[{"label": label, "score": score}]]
+
+    monkeypatch.setattr(moderation_service, "query_model", query_model)
+    return finished, cancelled
+
+
+def test_outcome_decided_needs_a_lead_the_pending_models_cannot_close():
+    assert outcome_decided({"toxic": 2.7, "not-toxic": 0.0}, pending=1)
+    assert not outcome_decided({"toxic": 1.8, "not-toxic": 0.0}, pending=2)
+    assert outcome_decided({"toxic": 0.9, "not-toxic": 0.8}, pending=0)
+
+
+async def test_quorum_returns_early_and_cancels_the_straggler(monkeypatch):
+    _, cancelled = _fake_models(monkeypatch, {
+        "a": (0.01, "toxic", 0.9),
+        "b": (0.02, "toxic", 0.9),
+        "c": (0.03, "toxic", 0.9),
+        "slow": (5.0, "non-toxic", 0.99),
+    })
+
+    weights, votes, skipped = await collect_toxicity_votes(
+        None, ["a", "b", "c", "slow"], "text", quorum=True, budget=2.0
+    )
+    await asyncio.sleep(0)  # let the cancellation land
+
+    assert votes == {"a": "toxic", "b": "toxic", "c": "toxic"}
+    assert skipped == ["slow"]
+    assert cancelled == ["slow"]
+    assert weights["toxic"] == pytest.approx(2.7)
+
+
+async def test_without_quorum_every_model_in_budget_votes(monkeypatch):
+    _fake_models(monkeypatch, {
+        "a": (0.01, "toxic", 0.9),
+        "b": (0.02, "toxic", 0.9),
+        "c": (0.03, "non-toxic", 0.8),
+    })
+
+    weights, votes, skipped = await collect_toxicity_votes(None, ["a", "b", "c"], "text", quorum=False, budget=2.0)
+
+    assert votes == {"a": "toxic", "b": "toxic", "c": "not-toxic"}
+    assert skipped == []
+    assert weights == {"toxic": pytest.approx(1.8), "not-toxic": pytest.approx(0.8)}
+
+
+async def test_budget_cancels_models_that_are_still_running(monkeypatch):
+    _, cancelled = _fake_models(monkeypatch, {
+        "fast": (0.01, "non-toxic", 0.9),
+        "hung": (5.0, "toxic", 0.9),
+    })
+
+    weights, votes, skipped = await collect_toxicity_votes(None, ["fast", "hung"], "text", quorum=False, budget=0.1)
+    await asyncio.sleep(0)
+
+    assert votes == {"fast": "not-toxic"}
+    assert skipped == ["hung"]
+    assert cancelled == ["hung"]
+
+
+async def test_a_close_race_waits_for_the_deciding_vote(monkeypatch):
+    _fake_models(monkeypatch, {
+        "a": (0.01, "toxic", 0.9),
+        "b": (0.02, "non-toxic", 0.95),
+        "c": (0.05, "toxic", 0.8),
+    })
+
+    weights, votes, skipped = await collect_toxicity_votes(None, ["a", "b", "c"], "text", quorum=True, budget=2.0)
+
+    assert set(votes) == {"a", "b", "c"}
+    assert skipped == []
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.services.mood_analytics import rolling_nanmean, run_lengths
+
+
+def _loop_rolling_nanmean(row: list, window: int) -> list:
+    out = []
+    for i in range(len(row)):
+        present = [v for v in row[max(0, i - window + 1):i + 1] if not np.isnan(v)]
+        out.append(sum(present) / len(present) if present else np.nan)
+    return out
+
+
+def _loop_run_lengths(row: list) -> list:
+    out, run = [], 0
+    for flag in row:
+        run = run + 1 if flag else 0
+        out.append(run)
+    return out
+
+
+@pytest.mark.parametrize("window", [1, 3, 7, 40])
+def test_rolling_nanmean_matches_a_plain_loop(window):
+    rng = np.random.default_rng(window)
+    values = rng.uniform(-1, 1, size=(4, 30))
+    values[rng.random(values.shape) < 0.4] = np.nan
+    values[2] = np.nan  # a user with no logged days at all
+
+    expected = np.array([_loop_rolling_nanmean(list(row), window) for row in values])
+    np.testing.assert_allclose(rolling_nanmean(values, window), expected, equal_nan=True)
+
+
+def test_rolling_nanmean_skips_missing_days():
+    values = np.array([1.0, np.nan, 3.0, np.nan, np.nan, np.nan])
+    result = rolling_nanmean(values, window=3)
+    np.testing.assert_allclose(result, [1.0, 1.0, 2.0, 3.0, 3.0, np.nan], equal_nan=True)
+
+
+def test_run_lengths_matches_a_plain_loop():
+    rng = np.random.default_rng(0)
+    flags = rng.random((5, 25)) < 0.6
+    flags[0] = True
+    flags[1] = False
+
+    expected = np.array([_loop_run_lengths(list(row)) for row in flags])
+    np.testing.assert_array_equal(run_lengths(flags), expected)
+
+
+def test_run_lengths_restarts_after_a_gap():
+    flags = np.array([True, True, False, True, True, True, False, False, True])
+    assert run_lengths(flags).tolist() == [1, 2, 0, 1, 2, 3, 0, 0, 1]
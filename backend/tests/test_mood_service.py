@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models.models import MoodEntry
+from app.services import mood_service
+from app.services.mood_service import (
+    MoodWriteQueue, get_mood_history, insert_mood_entries, list_mood_entries, store_mood_entry,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def database(tmp_path):
+    """A migrated SQLite database per test, through the same init_db the app uses."""
+    await db.init_db(f"sqlite+aiosqlite:///{tmp_path / 'mood.db'}")
+    try:
+        yield
+    finally:
+        await db.close_db()
+
+
+async def test_store_mood_entry_commits_entry_and_rollup(database):
+    entry = await store_mood_entry("u1", "feeling calm", "positive", 0.8)
+
+    entries, next_cursor = await list_mood_entries("u1")
+    assert [(e.id, e.mood_text, e.mood_label) for e in entries] == [(entry.id, "feeling calm", "positive")]
+    assert next_cursor is None
+
+    [day] = await get_mood_history("u1")
+    assert day["total"] == 1
+    assert day["labels"]["positive"] == {"count": 1, "avg_confidence": 0.8}
+
+
+async def test_anonymous_entries_are_stored_but_never_listed(database):
+    await store_mood_entry(None, "meh", "neutral", 0.5)
+    assert await list_mood_entries("") == ([], None)
+    assert await get_mood_history("") == []
+
+
+async def test_write_behind_flushes_on_stop(database, monkeypatch):
+    queue = MoodWriteQueue(max_batch=10, flush_interval=60)
+    monkeypatch.setattr(mood_service, "mood_write_queue", queue)
+    queue.start()
+
+    for i in range(3):
+        await store_mood_entry("u1", f"entry {i}", "negative", 0.6)
+    # Queued, not yet written: the batch waits for max_batch or flush_interval
+    assert queue.depth() == 3
+    assert await list_mood_entries("u1") == ([], None)
+
+    await queue.stop()
+    assert queue.stats() == {"queued": 0, "written": 3, "failed": 0}
+    entries, _ = await list_mood_entries("u1")
+    assert len(entries) == 3
+    [day] = await get_mood_history("u1")
+    assert day["labels"]["negative"]["count"] == 3
+
+
+async def test_list_mood_entries_pages_newest_first(database):
+    base = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+    # Two entries share a timestamp, so the id tiebreak has to carry across pages
+    moments = [base + timedelta(minutes=i) for i in range(4)] + [base + timedelta(minutes=3)]
+    await insert_mood_entries([
+        MoodEntry(user_id="u1", mood_text=f"entry {i}", mood_label="neutral", confidence=0.5, created_at=moment)
+        for i, moment in enumerate(moments)
+    ])
+    await insert_mood_entries([MoodEntry(user_id="u2", mood_text="other", mood_label="neutral", confidence=0.5)])
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await list_mood_entries("u1", limit=2, cursor=cursor)
+        assert len(page) <= 2
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 5
+    assert len({e.id for e in seen}) == 5
+    keys = [(e.created_at.replace(tzinfo=None), e.id) for e in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_list_mood_entries_rejects_a_bad_cursor(database):
+    with pytest.raises(ValueError):
+        await list_mood_entries("u1", cursor="not-a-cursor")
@@ -0,0 +1,113 @@
+import pytest
+from fastapi.requests import HTTPConnection
+
+from app.core import rate_limit
+from app.core.rate_limit import RateLimiter, RateLimitExceeded, client_ip
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Stands in for the `time` module inside rate_limit so buckets refill on demand."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+async def test_local_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter({"chat": (3, 60)})
+    for _ in range(3):
+        await limiter.hit("chat", "u1")
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.hit("chat", "u1")
+    assert exc.value.headers["Retry-After"] == "20"
+
+    # Other identities have their own bucket
+    await limiter.hit("chat", "u2")
+
+    clock.now += 20
+    await limiter.hit("chat", "u1")
+    assert limiter.stats()["allowed"] == 5
+    assert limiter.stats()["rejected"] == 1
+
+
+async def test_cost_takes_several_tokens(clock):
+    limiter = RateLimiter({"moderate_batch": (10, 10)})
+    await limiter.hit("moderate_batch", "u1", cost=8)
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.hit("moderate_batch", "u1", cost=5)
+    # 2 tokens left, 3 more needed at 1 token/s
+    assert exc.value.retry_after == 3
+    await limiter.hit("moderate_batch", "u1", cost=2)
+
+
+async def test_scale_raises_the_capacity(clock):
+    limiter = RateLimiter({"chat": (2, 60)})
+    for _ in range(10):
+        await limiter.hit("chat", "ip:1.2.3.4", scale=5)
+    with pytest.raises(RateLimitExceeded):
+        await limiter.hit("chat", "ip:1.2.3.4", scale=5)
+
+
+async def test_unlisted_routes_are_not_limited(clock):
+    limiter = RateLimiter({"chat": (1, 60)})
+    for _ in range(5):
+        await limiter.hit("health", "u1")
+    assert limiter.stats()["local_keys"] == 0
+
+
+async def test_redis_failure_falls_back_to_local_buckets(clock):
+    limiter = RateLimiter({"chat": (2, 60)})
+    calls = []
+
+    async def broken_script(keys, args):
+        calls.append(keys)
+        raise ConnectionError("redis down")
+
+    limiter._script = broken_script
+    await limiter.hit("chat", "u1")
+    await limiter.hit("chat", "u1")
+    with pytest.raises(RateLimitExceeded):
+        await limiter.hit("chat", "u1")
+    # Redis is still tried first on every hit, so it takes over again once it recovers
+    assert calls == [["mindmate:ratelimit:chat:u1"]] * 3
+    assert limiter.stats()["local_keys"] == 1
+
+
+async def test_local_buckets_evict_least_recently_used(clock):
+    limiter = RateLimiter({"chat": (1, 60)}, max_local_keys=2)
+    await limiter.hit("chat", "a")
+    await limiter.hit("chat", "b")
+    with pytest.raises(RateLimitExceeded):
+        await limiter.hit("chat", "a")  # touches "a", so "b" is now the oldest
+    await limiter.hit("chat", "c")
+    assert list(limiter._local) == ["chat:a", "chat:c"]
+    with pytest.raises(RateLimitExceeded):
+        await limiter.hit("chat", "a")
+
+
+def _connection(peer: str, forwarded: str = None) -> HTTPConnection:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return HTTPConnection({"type": "http", "headers": headers, "client": (peer, 5000)})
+
+
+def test_client_ip_uses_the_socket_peer_by_default():
+    assert client_ip(_connection("10.0.0.7", "6.6.6.6")) == "10.0.0.7"
+
+
+def test_client_ip_takes_the_hop_added_by_the_trusted_proxy():
+    request = _connection("10.0.0.7", "6.6.6.6, 203.0.113.5")
+    assert client_ip(request, trusted_proxies=1) == "203.0.113.5"
+    assert client_ip(request, trusted_proxies=2) == "6.6.6.6"
+    # Fewer hops than proxies: the request skipped them, so the header isn't trusted
+    assert client_ip(request, trusted_proxies=3) == "10.0.0.7"
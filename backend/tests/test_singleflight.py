@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+def _work(started: list, cancelled: list, result="verdict", delay: float = 0.05):
+    async def factory():
+        started.append(1)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return result
+    return factory
+
+
+async def test_concurrent_callers_share_one_call():
+    flights, started, cancelled = SingleFlight("test"), [], []
+    results = await asyncio.gather(*[flights.do("k", _work(started, cancelled)) for _ in range(5)])
+    assert results == ["verdict"] * 5
+    assert started == [1]
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+
+async def test_errors_are_shared():
+    flights = SingleFlight("test")
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(flights.do("k", boom), flights.do("k", boom), return_exceptions=True)
+    assert [str(r) for r in results] == ["upstream down"] * 2
+
+
+async def test_cancelled_caller_leaves_the_call_running_for_the_others():
+    flights, started, cancelled = SingleFlight("test"), [], []
+    leader = asyncio.create_task(flights.do("k", _work(started, cancelled)))
+    follower = asyncio.create_task(flights.do("k", _work(started, cancelled)))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    assert await follower == "verdict"
+    assert leader.cancelled()
+    assert started == [1] and cancelled == []
+
+
+async def test_last_waiter_cancelling_cancels_and_forgets_the_call():
+    flights, started, cancelled = SingleFlight("test"), [], []
+    waiters = [asyncio.create_task(flights.do("k", _work(started, cancelled, delay=10))) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert flights.stats()["in_flight"] == 1
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)  # let the shared task see its cancellation
+    assert cancelled == [1]
+    assert flights.stats()["in_flight"] == 0
+
+    # A new caller starts fresh instead of joining the dying call
+    assert await flights.do("k", _work(started, cancelled, result="fresh", delay=0)) == "fresh"
+    assert started == [1, 1]